@@ -3,6 +3,8 @@
 提供数据缓存功能，避免重复请求 akshare API
 """
 
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Optional, Any
 import pandas as pd
@@ -10,53 +12,81 @@ import akshare as ak
 
 
 class DataCache:
-    """简单的数据缓存类，支持过期时间"""
+    """简单的数据缓存类，支持过期时间（线程安全，供并发抓取使用）
+
+    指定 max_entries 时按最近使用顺序保留至多 max_entries 项，超出时淘汰最久未使用的一项；
+    默认不限条数，只按过期时间失效。
+    """
     
-    def __init__(self):
-        self._cache = {}
+    def __init__(self, max_entries: Optional[int] = None):
+        self._cache = OrderedDict()
         self._timestamps = {}
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
     
     def get(self, key: str, max_age_seconds: int = 300) -> Optional[Any]:
         """获取缓存数据，超过max_age_seconds秒则返回None"""
-        if key not in self._cache:
-            return None
-        
-        cached_time = self._timestamps.get(key, datetime.min)
-        if (datetime.now() - cached_time).total_seconds() > max_age_seconds:
-            # 缓存过期，删除
-            del self._cache[key]
-            del self._timestamps[key]
-            return None
-        
-        return self._cache[key]
+        with self._lock:
+            if key not in self._cache:
+                return None
+            
+            cached_time = self._timestamps.get(key, datetime.min)
+            if (datetime.now() - cached_time).total_seconds() > max_age_seconds:
+                # 缓存过期，删除
+                del self._cache[key]
+                del self._timestamps[key]
+                return None
+            
+            self._cache.move_to_end(key)
+            return self._cache[key]
     
     def set(self, key: str, value: Any):
         """设置缓存数据"""
-        self._cache[key] = value
-        self._timestamps[key] = datetime.now()
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            self._timestamps[key] = datetime.now()
+            
+            while self._max_entries is not None and len(self._cache) > self._max_entries:
+                oldest, _ = self._cache.popitem(last=False)
+                del self._timestamps[oldest]
     
-    def clear(self):
-        """清空缓存"""
-        self._cache.clear()
-        self._timestamps.clear()
+    def clear(self) -> dict:
+        """清空缓存，返回清空前的统计
+
+        持锁期间只整体换入空容器，统计与清空为同一时刻，键列表在锁外生成。
+        """
+        with self._lock:
+            old = self._cache
+            self._cache = OrderedDict()
+            self._timestamps = {}
+        return {
+            'cache_size': len(old),
+            'keys': list(old.keys())
+        }
     
     def stats(self) -> dict:
         """返回缓存统计信息"""
-        return {
-            'cache_size': len(self._cache),
-            'keys': list(self._cache.keys())
-        }
+        with self._lock:
+            return {
+                'cache_size': len(self._cache),
+                'keys': list(self._cache.keys())
+            }
 
 
-# 全局缓存实例
+# 全局缓存实例（行情、历史数据等按过期时间失效，不限条数）
 _cache = DataCache()
 
+# 报告及周线等派生数据的缓存：键中含代码和日期，跨日后旧键不再被读取，限制条数
+_report_cache = DataCache(max_entries=64)
+
 # 缓存过期时间配置（秒）
 CACHE_TTL = {
     'etf_spot': 60,        # ETF实时行情缓存60秒
     'etf_hist': 300,       # ETF历史数据缓存5分钟
     'index_spot': 60,      # 指数实时行情缓存60秒
     'index_hist': 300,     # 指数历史数据缓存5分钟
+    'etf_report': 300,     # ETF技术指标/趋势分析报告缓存5分钟（与历史数据同步刷新）
     'macro': 3600,         # 宏观数据缓存1小时
     'calendar': 3600,      # 经济日历缓存1小时
 }
@@ -74,6 +104,42 @@ def get_cached_etf_spot() -> pd.DataFrame:
     return df
 
 
+def get_cached_etf_derived(cache_key: str, build) -> tuple:
+    """获取由ETF实时行情派生的数据（带缓存），返回 (行情DataFrame, 派生数据)
+
+    派生数据与生成它的行情表一并缓存，行情刷新后自动重建，保证两者始终对应。
+    """
+    spot = get_cached_etf_spot()
+    cached = _cache.get(cache_key, CACHE_TTL['etf_spot'])
+    if cached is not None and cached[0] is spot:
+        return cached
+    
+    entry = (spot, build(spot))
+    _cache.set(cache_key, entry)
+    return entry
+
+
+def get_cached_etf_name_map() -> dict:
+    """获取ETF代码到名称的映射（带缓存），按代码查名称为O(1)字典查找"""
+    return get_cached_etf_derived(
+        'etf_name_map',
+        lambda df: dict(zip(df['代码'].to_numpy(), df['名称'].to_numpy()))
+    )[1]
+
+
+def get_cached_etf_row(code: str) -> Optional[dict]:
+    """按代码获取ETF实时行情（带缓存的代码→行号索引），未找到时返回None"""
+    spot, positions = get_cached_etf_derived(
+        'etf_code_index',
+        # 代码重复时保留第一次出现的行
+        lambda df: {c: i for i, c in reversed(list(enumerate(df['代码'].to_numpy())))}
+    )
+    pos = positions.get(code)
+    if pos is None:
+        return None
+    return spot.iloc[pos].to_dict()
+
+
 def get_cached_index_spot_sina() -> pd.DataFrame:
     """获取指数实时行情-新浪（带缓存）"""
     cache_key = 'index_spot_sina'
@@ -103,13 +169,24 @@ def get_cache() -> DataCache:
     return _cache
 
 
+def get_report_cache() -> DataCache:
+    """获取报告及派生数据的缓存实例（限制条数）"""
+    return _report_cache
+
+
+def _merge_stats(data_stats: dict, report_stats: dict) -> dict:
+    """合并数据缓存与报告缓存的统计"""
+    return {
+        'cache_size': data_stats['cache_size'] + report_stats['cache_size'],
+        'keys': data_stats['keys'] + report_stats['keys']
+    }
+
+
 def clear_cache() -> dict:
-    """清除缓存并返回统计"""
-    stats = _cache.stats()
-    _cache.clear()
-    return stats
+    """清除全部缓存并返回清除前的统计"""
+    return _merge_stats(_cache.clear(), _report_cache.clear())
 
 
 def get_cache_stats() -> dict:
     """获取缓存统计信息"""
-    return _cache.stats()
+    return _merge_stats(_cache.stats(), _report_cache.stats())
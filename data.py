@@ -3,31 +3,78 @@
 提供 ETF 和指数相关数据的获取函数
 """
 
+import weakref
 from datetime import datetime, timedelta
 import pandas as pd
 import akshare as ak
 
 from cache import (
     get_cached_etf_spot,
+    get_cached_etf_derived,
     get_cache,
+    get_report_cache,
     CACHE_TTL
 )
+from indicators import resample_to_weekly
+
+
+# 含正则元字符的查询仍按正则匹配，不走二字索引
+NAME_REGEX_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+
+def _build_name_index(spot: pd.DataFrame) -> tuple:
+    """为名称模糊搜索建立索引，返回 (小写名称列表, 相邻二字 → 升序行号列表)"""
+    lowered = [n.lower() if isinstance(n, str) else None for n in spot['名称'].tolist()]
+    postings = {}
+    for pos, n in enumerate(lowered):
+        if n is None:
+            continue
+        for gram in {n[i:i + 2] for i in range(len(n) - 1)}:
+            postings.setdefault(gram, []).append(pos)
+    return lowered, postings
+
+
+def get_cached_etf_name_index() -> tuple:
+    """获取名称搜索用的二字索引（带缓存），返回 (行情DataFrame, (小写名称列表, 倒排表))"""
+    return get_cached_etf_derived('etf_name_index', _build_name_index)
 
 
 def search_etf_by_name(name: str) -> list:
-    """根据名称搜索ETF（使用缓存）"""
+    """根据名称搜索ETF（使用缓存）
+
+    匹配结果存入条数受限的报告缓存，只以弱引用记下所用的行情表（不延长旧行情表的生命周期），
+    行情未刷新时同名查询直接返回，不再扫描名称列。
+    两个字以上的普通查询先按二字倒排表取候选行，再逐个确认子串，不扫描全部名称。
+    """
     try:
-        # 使用缓存获取ETF列表
-        etf_df = get_cached_etf_spot()
+        use_index = len(name) >= 2 and not NAME_REGEX_CHARS.intersection(name)
+        
+        # 使用缓存获取ETF列表（走索引时取与索引对应的同一份行情表）
+        if use_index:
+            etf_df, (lowered, postings) = get_cached_etf_name_index()
+        else:
+            etf_df = get_cached_etf_spot()
         
-        # 模糊匹配名称
-        matched = etf_df[etf_df['名称'].str.contains(name, case=False, na=False)]
+        _cache = get_report_cache()
+        cache_key = f'etf_search_{name}'
+        cached = _cache.get(cache_key, CACHE_TTL['etf_spot'])
+        if cached is not None and cached[0]() is etf_df:
+            return cached[1]
         
-        if matched.empty:
-            return []
+        # 模糊匹配名称（不区分大小写）
+        if use_index:
+            query = name.lower()
+            # 匹配的名称必含查询的每个二字，取最短的倒排表作候选即可
+            candidates = min(
+                (postings.get(query[i:i + 2], []) for i in range(len(query) - 1)),
+                key=len
+            )
+            matched = etf_df.iloc[[pos for pos in candidates if query in lowered[pos]]]
+        else:
+            matched = etf_df[etf_df['名称'].str.contains(name, case=False, na=False)]
         
         result = []
-        for _, row in matched.head(10).iterrows():
+        for row in matched.head(10).to_dict('records'):
             result.append({
                 'code': row['代码'],
                 'name': row['名称'],
@@ -35,24 +82,34 @@ def search_etf_by_name(name: str) -> list:
                 'change_pct': row.get('涨跌幅', 'N/A')
             })
         
+        _cache.set(cache_key, (weakref.ref(etf_df), result))
         return result
     except Exception as e:
         return [{'error': str(e)}]
 
 
 def get_etf_hist_data(code: str, days: int = 250) -> pd.DataFrame:
-    """获取ETF历史数据（使用缓存）"""
+    """获取ETF历史数据（使用缓存）
+
+    同一代码按不同天数多次查询时（排行30天、对比250天、综合分析365天、趋势730天），
+    每个代码只缓存已获取的最长区间，较短的区间直接按起始日期截取，不再重复请求，也不另存副本。
+    """
     try:
         _cache = get_cache()
         
-        # 生成缓存key（基于代码和天数）
-        cache_key = f'etf_hist_{code}_{days}'
-        cached = _cache.get(cache_key, CACHE_TTL['etf_hist'])
-        if cached is not None:
-            return cached
+        # 起止日期取自同一时刻，跨零点调用时两者仍一致
+        now = datetime.now()
+        end_date = now.strftime('%Y%m%d')
+        start_date = (now - timedelta(days=days)).strftime('%Y%m%d')
         
-        end_date = datetime.now().strftime('%Y%m%d')
-        start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
+        # 该代码已缓存的最长区间数据：(天数, DataFrame)
+        cache_key = f'etf_hist_{code}'
+        cached = _cache.get(cache_key, CACHE_TTL['etf_hist'])
+        if cached is not None and cached[0] >= days:
+            cached_days, wide_df = cached
+            if cached_days == days:
+                return wide_df
+            return wide_df[wide_df['date'] >= pd.Timestamp(start_date)].reset_index(drop=True)
         
         df = ak.fund_etf_hist_em(
             symbol=code,
@@ -74,14 +131,35 @@ def get_etf_hist_data(code: str, days: int = 250) -> pd.DataFrame:
         for col in numeric_cols:
             df[col] = pd.to_numeric(df[col], errors='coerce')
         
-        # 存入缓存
-        _cache.set(cache_key, df)
+        # 存入缓存（取代该代码较短区间的缓存）
+        _cache.set(cache_key, (days, df))
         
         return df
     except Exception as e:
         raise Exception(f"获取ETF历史数据失败: {str(e)}")
 
 
+def get_etf_weekly_data(code: str, days: int = 250) -> pd.DataFrame:
+    """获取ETF周线数据（使用缓存）
+
+    周线是日线数据的纯函数，缓存key中带上日线条数和最后一根K线日期，
+    日线数据更新后自动失效，热调用时省去 resample 聚合。
+    """
+    df = get_etf_hist_data(code, days)
+    if df.empty:
+        return df
+    
+    _cache = get_report_cache()
+    cache_key = f"etf_weekly_{code}_{days}_{len(df)}_{df['date'].iloc[-1]:%Y%m%d}"
+    cached = _cache.get(cache_key, CACHE_TTL['etf_hist'])
+    if cached is not None:
+        return cached
+    
+    weekly = resample_to_weekly(df)
+    _cache.set(cache_key, weekly)
+    return weekly
+
+
 def get_index_hist_data(symbol: str, days: int = 60) -> pd.DataFrame:
     """获取指数历史数据（使用缓存）"""
     _cache = get_cache()
@@ -6,12 +6,35 @@
 import pandas as pd
 import numpy as np
 
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    
+    # numba 为可选依赖，未安装时退化为普通 Python 函数
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+try:
+    import talib
+except ImportError:
+    # talib 为可选依赖，未安装时使用 pandas 实现
+    talib = None
+
 
 def calculate_ma(data: pd.Series, period: int) -> pd.Series:
     """计算移动平均线"""
     return data.rolling(window=period).mean()
 
 
+def calculate_ma_latest(values: np.ndarray, period: int) -> float:
+    """只计算最新一期的移动平均值，数据不足period时为NaN，不生成整条均线序列"""
+    return values[-period:].mean() if len(values) >= period else np.nan
+
+
 def calculate_ema(data: pd.Series, period: int) -> pd.Series:
     """计算指数移动平均线"""
     return data.ewm(span=period, adjust=False).mean()
@@ -101,10 +124,12 @@ def calculate_obv(data: pd.DataFrame) -> pd.Series:
 
 def resample_to_weekly(data: pd.DataFrame) -> pd.DataFrame:
     """将日线数据转换为周线数据"""
-    data = data.copy()
     if 'date' in data.columns:
-        data['date'] = pd.to_datetime(data['date'])
-        data.set_index('date', inplace=True)
+        # 日期列已是datetime类型时（如 get_etf_hist_data 的结果）跳过解析
+        dates = data['date']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        data = data.set_index(dates)
     
     weekly = data.resample('W').agg({
         'open': 'first',
@@ -118,68 +143,148 @@ def resample_to_weekly(data: pd.DataFrame) -> pd.DataFrame:
     return weekly
 
 
+def weekly_closes(data: pd.DataFrame) -> np.ndarray:
+    """返回每周最后一个交易日的收盘价，与 resample_to_weekly(data)['close'] 一致
+
+    只需周线收盘价时按日期直接分周取末值，省去对全部列的 resample 聚合；
+    数据含NaN时（resample 会跳过NaN取值并剔除不完整的周）回退到 resample_to_weekly。
+    """
+    ohlc = data[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+    if len(data) == 0 or np.isnan(ohlc).any():
+        return resample_to_weekly(data)['close'].to_numpy()
+    
+    # 1970-01-01 为周四，(天数 + 3) // 7 使周一至周日落在同一组，对应 resample('W') 的周日结尾
+    days = pd.to_datetime(data['date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+    week = (days + 3) // 7
+    last = np.flatnonzero(np.diff(week, append=week[-1] + 1))
+    return ohlc[last, 3]
+
+
+def lookup_zone(value: float, bins: np.ndarray, labels: tuple) -> str:
+    """按阈值表查找指标所处区间的标签
+
+    bins 升序排列，除最高阈值外均为左闭区间，最高阈值为右闭区间，
+    与 "x < 低阈值 / x > 高阈值 / 其余" 的判断方式一致。labels 长度为 len(bins) + 1。
+    """
+    return labels[int(np.digitize(value, bins[:-1])) + int(value > bins[-1])]
+
+
+class _MissingAsNA(dict):
+    """格式化模板时缺失的字段显示为 N/A"""
+    
+    def __missing__(self, key):
+        return 'N/A'
+
+
+# 技术指标摘要各段模板：(指标键, 模板)，按顺序输出存在的指标
+SUMMARY_SECTIONS = (
+    ('price_info',
+     "【价格信息】\n"
+     "  最新价: {latest_price}\n"
+     "  周涨跌幅: {weekly_change_pct}%\n"
+     "  月涨跌幅: {monthly_change_pct}%\n\n"),
+    ('boll',
+     "【布林带 BOLL】\n"
+     "  上轨: {upper}\n"
+     "  中轨: {middle}\n"
+     "  下轨: {lower}\n"
+     "  带宽: {bandwidth}%\n"
+     "  %B: {percent_b}%\n"
+     "  信号: {signal}\n\n"),
+    ('rsi',
+     "【RSI 相对强弱】\n"
+     "  RSI(6): {rsi_6}\n"
+     "  RSI(12): {rsi_12}\n"
+     "  RSI(14): {rsi_14}\n"
+     "  信号: {signal}\n\n"),
+    ('macd',
+     "【MACD 指标】\n"
+     "  DIF: {dif}\n"
+     "  DEA: {dea}\n"
+     "  MACD柱: {macd}\n"
+     "  信号: {signal}\n\n"),
+    ('kdj',
+     "【KDJ 随机指标】\n"
+     "  K: {k}\n"
+     "  D: {d}\n"
+     "  J: {j}\n"
+     "  信号: {signal}\n\n"),
+    ('ma',
+     "【均线系统】\n"
+     "  MA5: {ma5}\n"
+     "  MA10: {ma10}\n"
+     "  MA20: {ma20}\n"
+     "  MA60: {ma60}\n"
+     "  趋势: {trend}\n\n"),
+    ('volume',
+     "【成交量分析】\n"
+     "  当前成交量: {current}\n"
+     "  5日均量: {ma5}\n"
+     "  量比: {volume_ratio}\n\n"),
+)
+
+
 def format_indicator_summary(indicators: dict, name: str) -> str:
     """格式化技术指标摘要"""
-    summary = f"=== {name} 技术指标分析 ===\n\n"
-    
-    if 'price_info' in indicators:
-        pi = indicators['price_info']
-        summary += f"【价格信息】\n"
-        summary += f"  最新价: {pi.get('latest_price', 'N/A')}\n"
-        summary += f"  周涨跌幅: {pi.get('weekly_change_pct', 'N/A')}%\n"
-        summary += f"  月涨跌幅: {pi.get('monthly_change_pct', 'N/A')}%\n\n"
-    
-    if 'boll' in indicators:
-        boll = indicators['boll']
-        summary += f"【布林带 BOLL】\n"
-        summary += f"  上轨: {boll.get('upper', 'N/A')}\n"
-        summary += f"  中轨: {boll.get('middle', 'N/A')}\n"
-        summary += f"  下轨: {boll.get('lower', 'N/A')}\n"
-        summary += f"  带宽: {boll.get('bandwidth', 'N/A')}%\n"
-        summary += f"  %B: {boll.get('percent_b', 'N/A')}%\n"
-        summary += f"  信号: {boll.get('signal', 'N/A')}\n\n"
-    
-    if 'rsi' in indicators:
-        rsi = indicators['rsi']
-        summary += f"【RSI 相对强弱】\n"
-        summary += f"  RSI(6): {rsi.get('rsi_6', 'N/A')}\n"
-        summary += f"  RSI(12): {rsi.get('rsi_12', 'N/A')}\n"
-        summary += f"  RSI(14): {rsi.get('rsi_14', 'N/A')}\n"
-        summary += f"  信号: {rsi.get('signal', 'N/A')}\n\n"
-    
-    if 'macd' in indicators:
-        macd = indicators['macd']
-        summary += f"【MACD 指标】\n"
-        summary += f"  DIF: {macd.get('dif', 'N/A')}\n"
-        summary += f"  DEA: {macd.get('dea', 'N/A')}\n"
-        summary += f"  MACD柱: {macd.get('macd', 'N/A')}\n"
-        summary += f"  信号: {macd.get('signal', 'N/A')}\n\n"
-    
-    if 'kdj' in indicators:
-        kdj = indicators['kdj']
-        summary += f"【KDJ 随机指标】\n"
-        summary += f"  K: {kdj.get('k', 'N/A')}\n"
-        summary += f"  D: {kdj.get('d', 'N/A')}\n"
-        summary += f"  J: {kdj.get('j', 'N/A')}\n"
-        summary += f"  信号: {kdj.get('signal', 'N/A')}\n\n"
-    
-    if 'ma' in indicators:
-        ma = indicators['ma']
-        summary += f"【均线系统】\n"
-        summary += f"  MA5: {ma.get('ma5', 'N/A')}\n"
-        summary += f"  MA10: {ma.get('ma10', 'N/A')}\n"
-        summary += f"  MA20: {ma.get('ma20', 'N/A')}\n"
-        summary += f"  MA60: {ma.get('ma60', 'N/A')}\n"
-        summary += f"  趋势: {ma.get('trend', 'N/A')}\n\n"
-    
-    if 'volume' in indicators:
-        vol = indicators['volume']
-        summary += f"【成交量分析】\n"
-        summary += f"  当前成交量: {vol.get('current', 'N/A')}\n"
-        summary += f"  5日均量: {vol.get('ma5', 'N/A')}\n"
-        summary += f"  量比: {vol.get('volume_ratio', 'N/A')}\n\n"
-    
-    return summary
+    parts = [f"=== {name} 技术指标分析 ===\n\n"]
+    for key, template in SUMMARY_SECTIONS:
+        if key in indicators:
+            parts.append(template.format_map(_MissingAsNA(indicators[key])))
+    return ''.join(parts)
+
+
+# MACD状态表：行按 DIF与DEA 的大小关系(<,=,>)，列按 DIF与零轴 的关系(<,=,>)取值，
+# 状态编号 0=多头强势(DIF>DEA且DIF>0) 1=空头强势(DIF<DEA且DIF<0) 2=金叉 3=死叉
+MACD_STATE_TABLE = np.array([
+    [1, 3, 3],
+    [3, 3, 3],
+    [2, 2, 0],
+])
+
+# 均线排列状态表：下标为 (价格>MA5, MA5>MA10, MA10>MA20, 价格<MA5, MA5<MA10, MA10<MA20) 的6位编码，
+# 前三位全为1为多头排列、后三位全为1为空头排列，其余（含相等或NaN）为震荡
+MA_ALIGNMENT_STATES = ('mixed', 'bull', 'bear')
+MA_ALIGNMENT_TABLE = np.zeros(64, dtype=np.int8)
+MA_ALIGNMENT_TABLE[0b111000] = 1
+MA_ALIGNMENT_TABLE[0b000111] = 2
+
+# 信号汇总中各指标的区间表：(信号类别, 描述)，区间划分同 lookup_zone
+BOLL_SUMMARY_BINS = np.array([20, 80])
+BOLL_SUMMARY_SIGNALS = (
+    ('bullish', 'BOLL: 价格接近下轨，可能超卖'),
+    ('neutral', 'BOLL: 价格在布林带中间区域'),
+    ('bearish', 'BOLL: 价格接近上轨，可能超买'),
+)
+RSI_SUMMARY_BINS = np.array([30, 70])
+RSI_SUMMARY_SIGNALS = (
+    ('bullish', 'RSI({:.1f}): 超卖区域，可能反弹'),
+    ('neutral', 'RSI({:.1f}): 中性区域'),
+    ('bearish', 'RSI({:.1f}): 超买区域，可能回调'),
+)
+# 下标与 macd_state 返回的状态编号对应
+MACD_SUMMARY_SIGNALS = (
+    ('bullish', 'MACD: DIF在DEA上方且为正，多头强势'),
+    ('bearish', 'MACD: DIF在DEA下方且为负，空头强势'),
+    ('bullish', 'MACD: 金叉形成，看涨信号'),
+    ('bearish', 'MACD: 死叉形成，看跌信号'),
+)
+
+
+def macd_state(dif: float, dea: float) -> int:
+    """按DIF与DEA、零轴的相对位置查 MACD_STATE_TABLE 得到MACD状态编号，含NaN时视为死叉"""
+    cross = int(dif > dea) - int(dif < dea)
+    side = int(dif > 0) - int(dif < 0)
+    return int(MACD_STATE_TABLE[cross + 1, side + 1])
+
+
+def ma_alignment(latest, ma5, ma10, ma20):
+    """按价格与MA5/10/20的大小关系编码后查 MA_ALIGNMENT_TABLE，返回 MA_ALIGNMENT_STATES 的下标
+
+    参数可为标量，也可为等长的ndarray（批量判断多只ETF，返回下标数组）。
+    """
+    up = (latest > ma5) * 4 + (ma5 > ma10) * 2 + (ma10 > ma20) * 1
+    down = (latest < ma5) * 4 + (ma5 < ma10) * 2 + (ma10 < ma20) * 1
+    return MA_ALIGNMENT_TABLE[up * 8 + down]
 
 
 def get_indicator_signals(indicators: dict) -> dict:
@@ -196,24 +301,16 @@ def get_indicator_signals(indicators: dict) -> dict:
         boll = indicators['boll']
         pb = boll.get('percent_b', 50)
         if pb is not None:
-            if pb < 20:
-                signals['bullish'].append('BOLL: 价格接近下轨，可能超卖')
-            elif pb > 80:
-                signals['bearish'].append('BOLL: 价格接近上轨，可能超买')
-            else:
-                signals['neutral'].append('BOLL: 价格在布林带中间区域')
+            category, text = lookup_zone(pb, BOLL_SUMMARY_BINS, BOLL_SUMMARY_SIGNALS)
+            signals[category].append(text)
     
     # RSI信号
     if 'rsi' in indicators:
         rsi = indicators['rsi']
         rsi_14 = rsi.get('rsi_14', 50)
         if rsi_14 is not None:
-            if rsi_14 < 30:
-                signals['bullish'].append(f'RSI({rsi_14:.1f}): 超卖区域，可能反弹')
-            elif rsi_14 > 70:
-                signals['bearish'].append(f'RSI({rsi_14:.1f}): 超买区域，可能回调')
-            else:
-                signals['neutral'].append(f'RSI({rsi_14:.1f}): 中性区域')
+            category, text = lookup_zone(rsi_14, RSI_SUMMARY_BINS, RSI_SUMMARY_SIGNALS)
+            signals[category].append(text.format(rsi_14))
     
     # MACD信号
     if 'macd' in indicators:
@@ -221,14 +318,8 @@ def get_indicator_signals(indicators: dict) -> dict:
         dif = macd.get('dif', 0)
         dea = macd.get('dea', 0)
         if dif is not None and dea is not None:
-            if dif > dea and dif > 0:
-                signals['bullish'].append('MACD: DIF在DEA上方且为正，多头强势')
-            elif dif < dea and dif < 0:
-                signals['bearish'].append('MACD: DIF在DEA下方且为负，空头强势')
-            elif dif > dea:
-                signals['bullish'].append('MACD: 金叉形成，看涨信号')
-            else:
-                signals['bearish'].append('MACD: 死叉形成，看跌信号')
+            category, text = MACD_SUMMARY_SIGNALS[macd_state(dif, dea)]
+            signals[category].append(text)
     
     # KDJ信号
     if 'kdj' in indicators:
@@ -259,61 +350,44 @@ def get_indicator_signals(indicators: dict) -> dict:
     return signals
 
 
-def calculate_period_score(df: pd.DataFrame) -> dict:
-    """计算单个周期的技术指标评分"""
-    if len(df) < 20:
-        return None
-    
-    latest_price = df['close'].iloc[-1]
-    
-    # 均线
-    ma5 = calculate_ma(df['close'], 5).iloc[-1]
-    ma10 = calculate_ma(df['close'], 10).iloc[-1]
-    ma20 = calculate_ma(df['close'], 20).iloc[-1]
-    ma60 = calculate_ma(df['close'], min(60, len(df)-1)).iloc[-1] if len(df) > 60 else ma20
-    
-    # MACD
-    macd = calculate_macd(df['close'])
-    dif = macd['dif'].iloc[-1]
-    dea = macd['dea'].iloc[-1]
-    
-    # RSI
-    rsi_14 = calculate_rsi(df['close'], 14).iloc[-1]
-    
-    # BOLL
-    boll = calculate_boll(df)
-    percent_b = boll['percent_b'].iloc[-1]
-    
-    # 成交量
-    vol_ma5 = calculate_ma(df['volume'], 5).iloc[-1]
-    vol_ma20 = calculate_ma(df['volume'], min(20, len(df)-1)).iloc[-1] if len(df) > 20 else vol_ma5
-    current_vol = df['volume'].iloc[-1]
-    volume_ratio = current_vol / vol_ma5 if vol_ma5 > 0 else 1
-    vol_trend = vol_ma5 / vol_ma20 if vol_ma20 > 0 else 1
-    
-    # 评分
+# 周期评分各项信号描述，下标与 _period_score_kernel 返回的信号编号对应
+PERIOD_BOLL_DETAILS = (
+    "BOLL严重超卖({:.1f}%)", "BOLL接近下轨({:.1f}%)", "BOLL偏下轨({:.1f}%)",
+    "BOLL严重超买({:.1f}%)", "BOLL接近上轨({:.1f}%)", "BOLL偏上轨({:.1f}%)"
+)
+PERIOD_RSI_DETAILS = ("RSI严重超卖({:.1f})", "RSI超卖({:.1f})", "RSI严重超买({:.1f})", "RSI超买({:.1f})")
+PERIOD_MACD_DETAILS = ("MACD零轴上金叉", "MACD零轴下金叉", "MACD零轴下死叉", "MACD零轴上死叉")
+PERIOD_MA_DETAILS = ("均线多头排列", "短期多头", "均线空头排列", "短期空头", "均线交织")
+
+
+@njit(cache=True)
+def _period_score_kernel(latest_price, ma5, ma10, ma20, ma60, dif, dea,
+                         rsi_14, percent_b, volume_ratio, vol_trend):
+    """周期评分的数值核心，返回 (评分, BOLL信号, RSI信号, MACD信号, 均线信号)，无信号时编号为-1"""
     score = 0
-    details = []
+    boll_code = -1
+    rsi_code = -1
+    macd_code = -1
     
     # BOLL (35分)
     if percent_b < 10:
         score += 35
-        details.append(f"BOLL严重超卖({percent_b:.1f}%)")
+        boll_code = 0
     elif percent_b < 20:
         score += 25
-        details.append(f"BOLL接近下轨({percent_b:.1f}%)")
+        boll_code = 1
     elif percent_b < 35:
         score += 15
-        details.append(f"BOLL偏下轨({percent_b:.1f}%)")
+        boll_code = 2
     elif percent_b > 90:
         score -= 35
-        details.append(f"BOLL严重超买({percent_b:.1f}%)")
+        boll_code = 3
     elif percent_b > 80:
         score -= 25
-        details.append(f"BOLL接近上轨({percent_b:.1f}%)")
+        boll_code = 4
     elif percent_b > 65:
         score -= 15
-        details.append(f"BOLL偏上轨({percent_b:.1f}%)")
+        boll_code = 5
     
     # 成交量 (20分)
     if volume_ratio > 2.0 and latest_price > ma5:
@@ -332,16 +406,16 @@ def calculate_period_score(df: pd.DataFrame) -> dict:
     # RSI (15分)
     if rsi_14 < 20:
         score += 15
-        details.append(f"RSI严重超卖({rsi_14:.1f})")
+        rsi_code = 0
     elif rsi_14 < 30:
         score += 10
-        details.append(f"RSI超卖({rsi_14:.1f})")
+        rsi_code = 1
     elif rsi_14 > 80:
         score -= 15
-        details.append(f"RSI严重超买({rsi_14:.1f})")
+        rsi_code = 2
     elif rsi_14 > 70:
         score -= 10
-        details.append(f"RSI超买({rsi_14:.1f})")
+        rsi_code = 3
     elif rsi_14 > 50:
         score += 5
     else:
@@ -350,32 +424,80 @@ def calculate_period_score(df: pd.DataFrame) -> dict:
     # MACD (15分)
     if dif > dea and dif > 0:
         score += 15
-        details.append("MACD零轴上金叉")
+        macd_code = 0
     elif dif > dea and dif < 0:
         score += 8
-        details.append("MACD零轴下金叉")
+        macd_code = 1
     elif dif < dea and dif < 0:
         score -= 15
-        details.append("MACD零轴下死叉")
+        macd_code = 2
     elif dif < dea and dif > 0:
         score -= 8
-        details.append("MACD零轴上死叉")
+        macd_code = 3
     
     # 均线 (15分)
     if latest_price > ma5 > ma10 > ma20 > ma60:
         score += 15
-        details.append("均线多头排列")
+        ma_code = 0
     elif latest_price > ma5 > ma10 > ma20:
         score += 10
-        details.append("短期多头")
+        ma_code = 1
     elif latest_price < ma5 < ma10 < ma20 < ma60:
         score -= 15
-        details.append("均线空头排列")
+        ma_code = 2
     elif latest_price < ma5 < ma10 < ma20:
         score -= 10
-        details.append("短期空头")
+        ma_code = 3
     else:
-        details.append("均线交织")
+        ma_code = 4
+    
+    return score, boll_code, rsi_code, macd_code, ma_code
+
+
+def calculate_period_score(df: pd.DataFrame) -> dict:
+    """计算单个周期的技术指标评分"""
+    if len(df) < 20:
+        return None
+    
+    close = df['close'].to_numpy(dtype=np.float64)
+    volume = df['volume'].to_numpy(dtype=np.float64)
+    latest_price = close[-1]
+    
+    # 均线：只需最新一期数值
+    ma5 = calculate_ma_latest(close, 5)
+    ma10 = calculate_ma_latest(close, 10)
+    ma20 = calculate_ma_latest(close, 20)
+    ma60 = calculate_ma_latest(close, 60) if len(close) > 60 else ma20
+    
+    # MACD / RSI / BOLL：与技术指标报告共用单次遍历的末端计算
+    tail = calculate_tail_indicators(close)
+    dif = tail['dif']
+    dea = tail['dea']
+    rsi_14 = tail['rsi_14']
+    percent_b = tail['percent_b']
+    
+    # 成交量
+    vol_ma5 = calculate_ma_latest(volume, 5)
+    vol_ma20 = calculate_ma_latest(volume, 20) if len(volume) > 20 else vol_ma5
+    current_vol = volume[-1]
+    volume_ratio = current_vol / vol_ma5 if vol_ma5 > 0 else 1
+    vol_trend = vol_ma5 / vol_ma20 if vol_ma20 > 0 else 1
+    
+    # 评分
+    score, boll_code, rsi_code, macd_code, ma_code = _period_score_kernel(
+        float(latest_price), float(ma5), float(ma10), float(ma20), float(ma60),
+        float(dif), float(dea), float(rsi_14), float(percent_b),
+        float(volume_ratio), float(vol_trend)
+    )
+    
+    details = []
+    if boll_code >= 0:
+        details.append(PERIOD_BOLL_DETAILS[boll_code].format(percent_b))
+    if rsi_code >= 0:
+        details.append(PERIOD_RSI_DETAILS[rsi_code].format(rsi_14))
+    if macd_code >= 0:
+        details.append(PERIOD_MACD_DETAILS[macd_code])
+    details.append(PERIOD_MA_DETAILS[ma_code])
     
     return {
         'score': score,
@@ -391,65 +513,304 @@ def calculate_period_score(df: pd.DataFrame) -> dict:
     }
 
 
-def analyze_historical_indicators(df: pd.DataFrame, weeks: int) -> dict:
-    """分析历史周期内的技术指标统计"""
+def _talib_rsi_percent_b(close: np.ndarray, period: int = 14,
+                         boll_period: int = 20, std_dev: int = 2) -> tuple:
+    """用 talib 的 C 实现计算与 calculate_rsi / calculate_boll 口径一致的 RSI 和 %B
+
+    talib.RSI 为 Wilder 平滑、BBANDS 为总体标准差，与本模块的定义不同，
+    因此只借用 SMA / STDDEV 按本模块口径组合。
+    """
+    delta = np.diff(close, prepend=np.nan)
+    gain = talib.SMA(np.where(delta > 0, delta, 0.0), period)
+    loss = talib.SMA(np.where(delta < 0, -delta, 0.0), period)
+    
+    middle = talib.SMA(close, boll_period)
+    # STDDEV 为总体标准差，换算为与 rolling().std() 一致的样本标准差
+    std = talib.STDDEV(close, boll_period, 1) * np.sqrt(boll_period / (boll_period - 1))
+    upper = middle + std_dev * std
+    lower = middle - std_dev * std
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + gain / loss))
+        percent_b = (close - lower) / (upper - lower) * 100
+    return rsi, percent_b
+
+
+# calculate_tail_indicators 返回的指标顺序，与 _tail_indicator_kernel 的输出下标对应
+TAIL_INDICATOR_KEYS = (
+    'upper', 'middle', 'lower', 'bandwidth', 'percent_b',
+    'rsi_6', 'rsi_12', 'rsi_14', 'dif', 'dea', 'macd'
+)
+
+
+@njit(cache=True, error_model='numpy')
+def _tail_indicator_kernel(close):
+    """单次遍历计算收盘价序列最新一期的 BOLL(20,2)、RSI(6/12/14)、MACD(12,26,9)
+
+    口径与 calculate_boll / calculate_rsi / calculate_macd 一致，要求序列中不含NaN。
+    """
+    n = close.shape[0]
+    out = np.full(11, np.nan)
+    
+    # BOLL：最近20期均值与样本标准差
+    if n >= 20:
+        window = close[n - 20:]
+        middle = window.mean()
+        std = np.sqrt(((window - middle) ** 2).sum() / 19)
+        upper = middle + 2 * std
+        lower = middle - 2 * std
+        out[0] = upper
+        out[1] = middle
+        out[2] = lower
+        out[3] = (upper - lower) / middle * 100
+        out[4] = (close[n - 1] - lower) / (upper - lower) * 100
+    
+    # RSI：最近period期涨跌幅的简单平均，首个差分按0计
+    periods = np.array([6, 12, 14])
+    for j in range(3):
+        period = periods[j]
+        if n >= period:
+            gain = 0.0
+            loss = 0.0
+            for i in range(max(n - period, 1), n):
+                delta = close[i] - close[i - 1]
+                if delta > 0:
+                    gain += delta
+                elif delta < 0:
+                    loss -= delta
+            out[5 + j] = 100 - (100 / (1 + (gain / period) / (loss / period)))
+    
+    # MACD：与 ewm(adjust=False) 相同的递推
+    if n > 0:
+        a_fast = 2.0 / 13
+        a_slow = 2.0 / 27
+        a_signal = 2.0 / 10
+        ema_fast = close[0]
+        ema_slow = close[0]
+        dif = ema_fast - ema_slow
+        dea = dif
+        for i in range(1, n):
+            ema_fast = ((1 - a_fast) * ema_fast + a_fast * close[i]) / ((1 - a_fast) + a_fast)
+            ema_slow = ((1 - a_slow) * ema_slow + a_slow * close[i]) / ((1 - a_slow) + a_slow)
+            dif = ema_fast - ema_slow
+            dea = ((1 - a_signal) * dea + a_signal * dif) / ((1 - a_signal) + a_signal)
+        out[8] = dif
+        out[9] = dea
+        out[10] = 2 * (dif - dea)
+    
+    return out
+
+
+def calculate_tail_indicators(close: np.ndarray) -> dict:
+    """只计算收盘价序列最新一期的 BOLL/RSI/MACD，键见 TAIL_INDICATOR_KEYS
+
+    安装了 numba 时走融合的 JIT 内核，省去各指标整条序列的中间结果；
+    未安装 numba 或序列含NaN时使用 pandas 实现。
+    """
+    close = np.asarray(close, dtype=np.float64)
+    if HAS_NUMBA and not np.isnan(close).any():
+        return dict(zip(TAIL_INDICATOR_KEYS, _tail_indicator_kernel(close)))
+    
+    series = pd.Series(close)
+    boll = calculate_boll(pd.DataFrame({'close': series}))
+    macd = calculate_macd(series)
+    tail = {key: boll[key].iloc[-1] for key in ('upper', 'middle', 'lower', 'bandwidth', 'percent_b')}
+    for period in (6, 12, 14):
+        tail[f'rsi_{period}'] = calculate_rsi(series, period).iloc[-1]
+    for key in ('dif', 'dea', 'macd'):
+        tail[key] = macd[key].iloc[-1]
+    return tail
+
+
+@njit(cache=True, error_model='numpy')
+def _kdj_tail_kernel(high, low, close, n, m1, m2):
+    """按 calculate_kdj 的口径只计算最新一期的 K/D/J
+
+    RSV 中出现NaN（数据含NaN或窗口内最高价等于最低价）时 pandas 的 ewm 另有处理，
+    此时返回 ok=False，由调用方改用 pandas 实现。
+    """
+    size = close.shape[0]
+    out = np.full(3, np.nan)
+    if size < n:
+        return out, True
+    
+    a1 = 1.0 / m1
+    a2 = 1.0 / m2
+    k = 0.0
+    d = 0.0
+    for i in range(n - 1, size):
+        lowest = low[i - n + 1:i + 1].min()
+        highest = high[i - n + 1:i + 1].max()
+        rsv = (close[i] - lowest) / (highest - lowest) * 100
+        if not np.isfinite(rsv):
+            return out, False
+        if i == n - 1:
+            k = rsv
+            d = k
+        else:
+            # 与 ewm(adjust=False) 相同的递推
+            k = ((1 - a1) * k + a1 * rsv) / ((1 - a1) + a1)
+            d = ((1 - a2) * d + a2 * k) / ((1 - a2) + a2)
+    
+    out[0] = k
+    out[1] = d
+    out[2] = 3 * k - 2 * d
+    return out, True
+
+
+def calculate_kdj_latest(data: pd.DataFrame, n: int = 9, m1: int = 3, m2: int = 3) -> dict:
+    """只计算最新一期的KDJ值，口径与 calculate_kdj 一致
+
+    安装了 numba 时走 JIT 内核，不生成整条 RSV/K/D 序列；否则或RSV含NaN时使用 pandas 实现。
+    """
+    if HAS_NUMBA:
+        values, ok = _kdj_tail_kernel(
+            data['high'].to_numpy(dtype=np.float64),
+            data['low'].to_numpy(dtype=np.float64),
+            data['close'].to_numpy(dtype=np.float64),
+            n, m1, m2
+        )
+        if ok:
+            return dict(zip(('k', 'd', 'j'), values))
+    
+    return {key: series.to_numpy()[-1] for key, series in calculate_kdj(data, n, m1, m2).items()}
+
+
+@njit(cache=True)
+def _macd_series_kernel(close, fast=12, slow=26, signal=9):
+    """按 ewm(adjust=False) 的递推计算整条 DIF/DEA 序列，要求序列中不含NaN"""
+    n = close.shape[0]
+    dif = np.empty(n)
+    dea = np.empty(n)
+    if n == 0:
+        return dif, dea
+    
+    a_fast = 2.0 / (fast + 1)
+    a_slow = 2.0 / (slow + 1)
+    a_signal = 2.0 / (signal + 1)
+    ema_fast = close[0]
+    ema_slow = close[0]
+    dif[0] = 0.0
+    dea[0] = 0.0
+    for i in range(1, n):
+        ema_fast = ((1 - a_fast) * ema_fast + a_fast * close[i]) / ((1 - a_fast) + a_fast)
+        ema_slow = ((1 - a_slow) * ema_slow + a_slow * close[i]) / ((1 - a_slow) + a_slow)
+        dif[i] = ema_fast - ema_slow
+        dea[i] = ((1 - a_signal) * dea[i - 1] + a_signal * dif[i]) / ((1 - a_signal) + a_signal)
+    return dif, dea
+
+
+def calculate_indicator_arrays(df: pd.DataFrame) -> dict:
+    """一次性计算整段K线的RSI/MACD/BOLL序列，供多个统计窗口切片复用
+
+    结果中一并带上计算所用的收盘价数组（close），调用方取最新价或按窗口切片时不必再从DataFrame取列。
+    安装了 talib 时 RSI 和 BOLL 走 C 实现；MACD 的 EMA 初值口径与 talib 不同，
+    安装了 numba 时走 JIT 递推内核，否则用 pandas 计算。
+    """
+    close = df['close']
+    values = close.to_numpy(dtype=np.float64)
+    
+    if HAS_NUMBA and not np.isnan(values).any():
+        dif, dea = _macd_series_kernel(values)
+    else:
+        macd = calculate_macd(close)
+        dif = macd['dif'].to_numpy()
+        dea = macd['dea'].to_numpy()
+    
+    if talib is not None:
+        rsi, percent_b = _talib_rsi_percent_b(values)
+    else:
+        rsi = calculate_rsi(close, 14).to_numpy()
+        percent_b = calculate_boll(df)['percent_b'].to_numpy()
+    
+    return {
+        'close': values,
+        'rsi': rsi,
+        'dif': dif,
+        'dea': dea,
+        'percent_b': percent_b
+    }
+
+
+def calculate_latest_indicators(closes: pd.DataFrame) -> pd.DataFrame:
+    """对多列收盘价（每列一只ETF）整体计算RSI/MACD/BOLL，返回每列最新一期的指标
+
+    各列独立计算，按末端对齐后前部的NaN不影响最新值；
+    返回以原列名为索引、rsi/dif/dea/percent_b为列的DataFrame。
+    """
+    rsi = calculate_rsi(closes, 14)
+    macd = calculate_macd(closes)
+    middle = calculate_ma(closes, 20)
+    std = closes.rolling(window=20).std()
+    upper = middle + 2 * std
+    lower = middle - 2 * std
+    percent_b = (closes - lower) / (upper - lower) * 100
+    
+    return pd.DataFrame({
+        'rsi': rsi.iloc[-1],
+        'dif': macd['dif'].iloc[-1],
+        'dea': macd['dea'].iloc[-1],
+        'percent_b': percent_b.iloc[-1]
+    })
+
+
+def _nan_summary(values: np.ndarray) -> tuple:
+    """返回去除NaN后的(均值, 最小值, 最大值)，无有效值时均为NaN"""
+    valid = values[~np.isnan(values)]
+    if valid.size == 0:
+        return np.nan, np.nan, np.nan
+    return valid.mean(), valid.min(), valid.max()
+
+
+def analyze_historical_indicators(df: pd.DataFrame, weeks: int, arrays: dict = None) -> dict:
+    """分析历史周期内的技术指标统计
+
+    指标序列在整段数据上计算后再截取最近weeks周，保证窗口内的指标已充分预热。
+    arrays 为 calculate_indicator_arrays 的结果，多个窗口共用同一份数据时传入以避免重复计算。
+    """
     if len(df) < weeks:
         weeks = len(df)
     
+    if arrays is None:
+        arrays = calculate_indicator_arrays(df)
+    
     # 取指定周数的数据
-    period_df = df.tail(weeks).copy()
-    
-    # 计算整个周期的指标序列
-    rsi_series = calculate_rsi(period_df['close'], 14)
-    boll = calculate_boll(period_df)
-    macd = calculate_macd(period_df['close'])
-    
-    # 统计金叉死叉次数
-    dif_series = macd['dif']
-    dea_series = macd['dea']
-    cross_up = 0  # 金叉次数
-    cross_down = 0  # 死叉次数
-    for i in range(1, len(dif_series)):
-        if dif_series.iloc[i] > dea_series.iloc[i] and dif_series.iloc[i-1] <= dea_series.iloc[i-1]:
-            cross_up += 1
-        elif dif_series.iloc[i] < dea_series.iloc[i] and dif_series.iloc[i-1] >= dea_series.iloc[i-1]:
-            cross_down += 1
+    close = arrays['close'][-weeks:]
+    rsi_arr = arrays['rsi'][-weeks:]
+    dif_arr = arrays['dif'][-weeks:]
+    dea_arr = arrays['dea'][-weeks:]
+    pb_arr = arrays['percent_b'][-weeks:]
+    
+    # 统计金叉死叉次数：DIF-DEA 符号由非正转正为金叉，由非负转负为死叉
+    cross_sign = np.sign(dif_arr - dea_arr)
+    cross_up = int(((cross_sign[1:] == 1) & (cross_sign[:-1] <= 0)).sum())  # 金叉次数
+    cross_down = int(((cross_sign[1:] == -1) & (cross_sign[:-1] >= 0)).sum())  # 死叉次数
     
     # RSI统计
-    rsi_valid = rsi_series.dropna()
-    rsi_oversold_count = (rsi_valid < 30).sum()  # 超卖次数
-    rsi_overbought_count = (rsi_valid > 70).sum()  # 超买次数
-    rsi_avg = rsi_valid.mean()
-    rsi_min = rsi_valid.min()
-    rsi_max = rsi_valid.max()
+    rsi_oversold_count = (rsi_arr < 30).sum()  # 超卖次数
+    rsi_overbought_count = (rsi_arr > 70).sum()  # 超买次数
+    rsi_avg, rsi_min, rsi_max = _nan_summary(rsi_arr)
     
     # BOLL %B统计
-    pb_series = boll['percent_b'].dropna()
-    pb_near_lower = (pb_series < 20).sum()  # 接近下轨次数
-    pb_near_upper = (pb_series > 80).sum()  # 接近上轨次数
-    pb_avg = pb_series.mean()
-    pb_min = pb_series.min()
-    pb_max = pb_series.max()
+    pb_near_lower = (pb_arr < 20).sum()  # 接近下轨次数
+    pb_near_upper = (pb_arr > 80).sum()  # 接近上轨次数
+    pb_avg, pb_min, pb_max = _nan_summary(pb_arr)
     
     # 价格涨跌幅
-    start_price = period_df['close'].iloc[0]
-    end_price = period_df['close'].iloc[-1]
-    total_change = (end_price - start_price) / start_price * 100
+    total_change = (close[-1] - close[0]) / close[0] * 100
     
     # 最大回撤
-    cummax = period_df['close'].cummax()
-    drawdown = (period_df['close'] - cummax) / cummax * 100
-    max_drawdown = drawdown.min()
+    cummax = np.maximum.accumulate(close)
+    max_drawdown = ((close - cummax) / cummax * 100).min()
     
     # 最大涨幅（从最低点算起）
-    cummin = period_df['close'].cummin()
-    rally = (period_df['close'] - cummin) / cummin * 100
-    max_rally = rally.max()
+    cummin = np.minimum.accumulate(close)
+    max_rally = ((close - cummin) / cummin * 100).max()
     
     # 周度涨跌统计
-    weekly_changes = period_df['close'].pct_change() * 100
-    up_weeks = (weekly_changes > 0).sum()
-    down_weeks = (weekly_changes < 0).sum()
+    weekly_diff = np.diff(close)
+    up_weeks = (weekly_diff > 0).sum()
+    down_weeks = (weekly_diff < 0).sum()
     
     return {
         'weeks': weeks,
@@ -44,9 +44,12 @@ def test_case(name: str):
 # 导入主模块中的函数
 from main import (
     # 工具函数
-    calculate_ma, calculate_ema, calculate_boll, calculate_rsi,
+    calculate_ma, calculate_ma_latest, calculate_ema, calculate_boll, calculate_rsi,
     calculate_macd, calculate_kdj, calculate_atr, calculate_obv,
-    resample_to_weekly, get_indicator_signals,
+    resample_to_weekly, get_indicator_signals, lookup_zone, macd_state,
+    ma_alignment, MA_ALIGNMENT_STATES,
+    analyze_historical_indicators, calculate_latest_indicators, calculate_tail_indicators,
+    calculate_indicator_arrays, calculate_kdj_latest, weekly_closes,
     # 数据获取函数
     search_etf_by_name, get_etf_hist_data,
     # MCP工具
@@ -58,6 +61,7 @@ from main import (
 )
 import pandas as pd
 import numpy as np
+import data
 
 
 # ==================== 工具函数测试 ====================
@@ -77,6 +81,18 @@ def test_calculate_ma():
     return True
 
 
+@test_case("calculate_ma_latest - 最新一期移动平均")
+def test_calculate_ma_latest():
+    values = np.arange(1, 11, dtype=float)
+    
+    assert abs(calculate_ma_latest(values, 3) - 9.0) < 0.001, "最新MA3应为9.0"
+    assert abs(calculate_ma_latest(values, 3) - calculate_ma(pd.Series(values), 3).iloc[-1]) < 1e-12, "应与整条均线的末值一致"
+    assert np.isnan(calculate_ma_latest(values, 20)), "数据不足时应为NaN"
+    
+    print("  最新一期均线计算正常")
+    return True
+
+
 @test_case("calculate_ema - 指数移动平均线计算")
 def test_calculate_ema():
     data = pd.Series([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
@@ -331,6 +347,165 @@ def test_get_indicator_signals_neutral():
     return True
 
 
+@test_case("lookup_zone - 区间表查找")
+def test_lookup_zone():
+    bins = np.array([30, 50, 70])
+    labels = ('超卖', '偏弱', '偏强', '超买')
+    
+    assert lookup_zone(10, bins, labels) == '超卖', "低于下阈值应为超卖"
+    assert lookup_zone(30, bins, labels) == '偏弱', "等于下阈值应归入偏弱"
+    assert lookup_zone(50, bins, labels) == '偏强', "等于中阈值应归入偏强"
+    assert lookup_zone(70, bins, labels) == '偏强', "等于上阈值应归入偏强"
+    assert lookup_zone(70.01, bins, labels) == '超买', "高于上阈值应为超买"
+    
+    print("  区间边界判断正常")
+    return True
+
+
+@test_case("macd_state - MACD状态查表")
+def test_macd_state():
+    assert macd_state(0.5, 0.2) == 0, "DIF>DEA且为正应为多头强势"
+    assert macd_state(-0.5, -0.2) == 1, "DIF<DEA且为负应为空头强势"
+    assert macd_state(-0.2, -0.5) == 2, "零轴下DIF>DEA应为金叉"
+    assert macd_state(0.2, 0.5) == 3, "零轴上DIF<DEA应为死叉"
+    assert macd_state(0.0, 0.0) == 3, "DIF等于DEA应为死叉"
+    assert macd_state(float('nan'), 0.1) == 3, "含NaN应为死叉"
+    
+    print("  MACD状态查表正常")
+    return True
+
+
+@test_case("ma_alignment - 均线排列查表")
+def test_ma_alignment():
+    assert MA_ALIGNMENT_STATES[ma_alignment(11, 10, 9, 8)] == 'bull', "价格>MA5>MA10>MA20应为多头排列"
+    assert MA_ALIGNMENT_STATES[ma_alignment(8, 9, 10, 11)] == 'bear', "价格<MA5<MA10<MA20应为空头排列"
+    assert MA_ALIGNMENT_STATES[ma_alignment(10, 10, 9, 8)] == 'mixed', "价格等于MA5应为震荡"
+    assert MA_ALIGNMENT_STATES[ma_alignment(11, 10, 9, float('nan'))] == 'mixed', "含NaN应为震荡"
+    
+    # 批量判断
+    states = ma_alignment(np.array([11, 8, 10]), np.array([10, 9, 10]), np.array([9, 10, 9]), np.array([8, 11, 8]))
+    assert [MA_ALIGNMENT_STATES[s] for s in states] == ['bull', 'bear', 'mixed'], "批量判断结果不一致"
+    
+    print("  均线排列查表正常")
+    return True
+
+
+@test_case("analyze_historical_indicators - 历史周期统计")
+def test_analyze_historical_indicators():
+    close = [10.0] * 30 + [12.0, 9.0, 11.0, 13.0, 12.0]
+    data = pd.DataFrame({'close': close})
+    
+    stats = analyze_historical_indicators(data, 5)
+    
+    assert stats['weeks'] == 5, "统计周数应为5"
+    assert stats['total_change'] == 0.0, f"区间涨跌幅应为0, 实际为{stats['total_change']}"
+    assert stats['max_drawdown'] == -25.0, f"最大回撤应为-25%, 实际为{stats['max_drawdown']}"
+    assert stats['max_rally'] == 44.44, f"最大涨幅应为44.44%, 实际为{stats['max_rally']}"
+    assert stats['up_weeks'] == 2 and stats['down_weeks'] == 2, "涨跌周数统计错误"
+    assert isinstance(stats['macd_cross_up'], int), "金叉次数应为整数"
+    assert stats['rsi_max'] == 100.0, "窗口内RSI应使用完整历史预热后的值"
+    
+    print(f"  统计结果: {stats}")
+    return True
+
+
+@test_case("calculate_latest_indicators - 多列指标向量化计算")
+def test_calculate_latest_indicators():
+    np.random.seed(7)
+    long_close = pd.Series(100 + np.cumsum(np.random.randn(60)))
+    short_close = pd.Series(50 + np.cumsum(np.random.randn(40)))
+    
+    # 两列长度不同，按末端对齐
+    closes = pd.concat({
+        'a': pd.Series(long_close.to_numpy(), index=np.arange(-60, 0)),
+        'b': pd.Series(short_close.to_numpy(), index=np.arange(-40, 0))
+    }, axis=1)
+    latest = calculate_latest_indicators(closes)
+    
+    for key, close in (('a', long_close), ('b', short_close)):
+        macd = calculate_macd(close)
+        boll = calculate_boll(pd.DataFrame({'close': close}))
+        assert abs(latest.at[key, 'rsi'] - calculate_rsi(close, 14).iloc[-1]) < 1e-9, f"{key} RSI与单列计算不一致"
+        assert abs(latest.at[key, 'dif'] - macd['dif'].iloc[-1]) < 1e-9, f"{key} DIF与单列计算不一致"
+        assert abs(latest.at[key, 'dea'] - macd['dea'].iloc[-1]) < 1e-9, f"{key} DEA与单列计算不一致"
+        assert abs(latest.at[key, 'percent_b'] - boll['percent_b'].iloc[-1]) < 1e-6, f"{key} BOLL%B与单列计算不一致"
+    
+    print(f"  最新指标:\n{latest.round(2)}")
+    return True
+
+
+@test_case("calculate_tail_indicators - 最新一期指标")
+def test_calculate_tail_indicators():
+    np.random.seed(11)
+    close = pd.Series(100 + np.cumsum(np.random.randn(120)))
+    tail = calculate_tail_indicators(close.to_numpy())
+    
+    boll = calculate_boll(pd.DataFrame({'close': close}))
+    macd = calculate_macd(close)
+    assert abs(tail['percent_b'] - boll['percent_b'].iloc[-1]) < 1e-6, "BOLL%B与序列计算不一致"
+    assert abs(tail['upper'] - boll['upper'].iloc[-1]) < 1e-6, "BOLL上轨与序列计算不一致"
+    for period in (6, 12, 14):
+        assert abs(tail[f'rsi_{period}'] - calculate_rsi(close, period).iloc[-1]) < 1e-9, f"RSI{period}与序列计算不一致"
+    assert abs(tail['dif'] - macd['dif'].iloc[-1]) < 1e-9, "DIF与序列计算不一致"
+    assert abs(tail['dea'] - macd['dea'].iloc[-1]) < 1e-9, "DEA与序列计算不一致"
+    
+    print(f"  最新指标: RSI14={tail['rsi_14']:.2f}, DIF={tail['dif']:.4f}, %B={tail['percent_b']:.2f}")
+    return True
+
+
+@test_case("calculate_indicator_arrays - 整段指标序列")
+def test_calculate_indicator_arrays():
+    np.random.seed(13)
+    close = pd.Series(100 + np.cumsum(np.random.randn(150)))
+    arrays = calculate_indicator_arrays(pd.DataFrame({'close': close}))
+    
+    macd = calculate_macd(close)
+    boll = calculate_boll(pd.DataFrame({'close': close}))
+    assert np.allclose(arrays['dif'], macd['dif'].to_numpy(), atol=1e-9), "DIF序列与pandas计算不一致"
+    assert np.allclose(arrays['dea'], macd['dea'].to_numpy(), atol=1e-9), "DEA序列与pandas计算不一致"
+    assert np.allclose(arrays['rsi'], calculate_rsi(close, 14).to_numpy(), atol=1e-6, equal_nan=True), "RSI序列不一致"
+    assert np.allclose(arrays['percent_b'], boll['percent_b'].to_numpy(), atol=1e-6, equal_nan=True), "BOLL%B序列不一致"
+    
+    print(f"  序列长度: {len(arrays['dif'])}, 最新DIF={arrays['dif'][-1]:.4f}")
+    return True
+
+
+@test_case("calculate_kdj_latest - 最新KDJ值")
+def test_calculate_kdj_latest():
+    np.random.seed(17)
+    close = 100 + np.cumsum(np.random.randn(120))
+    df = pd.DataFrame({
+        'close': close,
+        'high': close + np.abs(np.random.randn(120)),
+        'low': close - np.abs(np.random.randn(120)),
+    })
+    
+    latest = calculate_kdj_latest(df)
+    kdj = calculate_kdj(df)
+    for key in ('k', 'd', 'j'):
+        assert np.isclose(latest[key], kdj[key].iloc[-1], atol=1e-9), f"{key.upper()}值与序列计算不一致"
+    
+    print(f"  最新KDJ: K={latest['k']:.2f}, D={latest['d']:.2f}, J={latest['j']:.2f}")
+    return True
+
+
+@test_case("weekly_closes - 周线收盘价")
+def test_weekly_closes():
+    dates = pd.bdate_range('2024-01-01', periods=120).delete([20, 21, 22, 23, 24])
+    np.random.seed(19)
+    close = 100 + np.cumsum(np.random.randn(len(dates)))
+    df = pd.DataFrame({
+        'date': dates, 'open': close, 'high': close + 1,
+        'low': close - 1, 'close': close, 'volume': np.ones(len(dates))
+    })
+    
+    expected = resample_to_weekly(df)['close'].to_numpy()
+    assert np.array_equal(weekly_closes(df), expected), "周线收盘价与resample结果不一致"
+    
+    print(f"  周数: {len(expected)}, 最新周收盘: {expected[-1]:.2f}")
+    return True
+
+
 @test_case("边界情况 - 空数据处理")
 def test_edge_case_empty_data():
     # 测试空Series的MA计算
@@ -610,6 +785,30 @@ def test_get_market_overview():
     return True
 
 
+@test_case("get_etf_performance_ranking - 重复排行命中缓存")
+def test_get_etf_performance_ranking_cached():
+    get_etf_performance_ranking("week", 10)
+    
+    # 第二次调用期间统计历史数据请求次数
+    fetch = data.ak.fund_etf_hist_em
+    calls = []
+    def counting_fetch(*args, **kwargs):
+        calls.append(kwargs.get('symbol'))
+        return fetch(*args, **kwargs)
+    
+    data.ak.fund_etf_hist_em = counting_fetch
+    try:
+        result = get_etf_performance_ranking("week", 10)
+    finally:
+        data.ak.fund_etf_hist_em = fetch
+    
+    assert isinstance(result, str), "返回值应为字符串"
+    assert not calls, f"缓存有效期内重复排行不应再请求历史数据，实际请求{len(calls)}次"
+    
+    print(f"  结果预览: {result[:300]}...")
+    return True
+
+
 @test_case("analyze_etf_trend - ETF趋势分析")
 def test_analyze_etf_trend():
     result = analyze_etf_trend("510300")
@@ -648,6 +847,7 @@ def run_unit_tests():
     print("="*70)
     
     test_calculate_ma()
+    test_calculate_ma_latest()
     test_calculate_ema()
     test_calculate_boll()
     test_calculate_rsi()
@@ -659,6 +859,15 @@ def run_unit_tests():
     test_get_indicator_signals()
     test_get_indicator_signals_overbought()
     test_get_indicator_signals_neutral()
+    test_lookup_zone()
+    test_macd_state()
+    test_ma_alignment()
+    test_analyze_historical_indicators()
+    test_calculate_latest_indicators()
+    test_calculate_tail_indicators()
+    test_calculate_indicator_arrays()
+    test_calculate_kdj_latest()
+    test_weekly_closes()
     test_edge_case_empty_data()
     test_edge_case_large_period()
     
@@ -692,6 +901,7 @@ def run_integration_tests():
     test_compare_etfs_single()
     test_compare_etfs_too_many()
     test_get_market_overview()
+    test_get_etf_performance_ranking_cached()
     test_analyze_etf_trend()
     test_get_multi_etf_indicators()
     
@@ -725,6 +935,7 @@ def run_all_tests():
     # 工具函数测试
     print("\n\n>>> 工具函数测试 <<<")
     test_calculate_ma()
+    test_calculate_ma_latest()
     test_calculate_ema()
     test_calculate_boll()
     test_calculate_rsi()
@@ -736,6 +947,15 @@ def run_all_tests():
     test_get_indicator_signals()
     test_get_indicator_signals_overbought()
     test_get_indicator_signals_neutral()
+    test_lookup_zone()
+    test_macd_state()
+    test_ma_alignment()
+    test_analyze_historical_indicators()
+    test_calculate_latest_indicators()
+    test_calculate_tail_indicators()
+    test_calculate_indicator_arrays()
+    test_calculate_kdj_latest()
+    test_weekly_closes()
     test_edge_case_empty_data()
     test_edge_case_large_period()
     
@@ -761,6 +981,7 @@ def run_all_tests():
     test_compare_etfs_single()
     test_compare_etfs_too_many()
     test_get_market_overview()
+    test_get_etf_performance_ranking_cached()
     test_analyze_etf_trend()
     test_get_multi_etf_indicators()
     
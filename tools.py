@@ -3,39 +3,521 @@ MCP 工具定义模块
 定义所有暴露给 AI Agent 的 MCP 工具
 """
 
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Optional
+import numpy as np
 import pandas as pd
 import akshare as ak
 
 from cache import (
     get_cached_etf_spot,
+    get_cached_etf_name_map,
+    get_cached_etf_row,
+    get_cached_etf_derived,
     get_cached_index_spot_sina,
     get_cached_index_global_spot,
-    get_cache,
+    get_report_cache,
     clear_cache as cache_clear,
     get_cache_stats as cache_stats,
     CACHE_TTL
 )
 from indicators import (
-    calculate_ma,
-    calculate_boll,
-    calculate_rsi,
-    calculate_macd,
-    calculate_kdj,
-    resample_to_weekly,
+    calculate_ma_latest,
+    calculate_kdj_latest,
     format_indicator_summary,
     get_indicator_signals,
     calculate_period_score,
+    calculate_indicator_arrays,
+    calculate_tail_indicators,
+    calculate_latest_indicators,
+    weekly_closes,
     analyze_historical_indicators,
-    get_period_trend_judgment
+    get_period_trend_judgment,
+    lookup_zone,
+    macd_state,
+    ma_alignment,
+    MA_ALIGNMENT_STATES
 )
 from data import (
     search_etf_by_name,
+    get_cached_etf_name_index,
     get_etf_hist_data,
+    get_etf_weekly_data,
     get_index_hist_data
 )
 
 
+# ==================== 信号区间表 ====================
+
+# 技术指标报告中的区间判断
+BOLL_SIGNAL_BINS = np.array([20, 50, 80])
+BOLL_SIGNAL_LABELS = ('接近下轨，可能超卖', '价格偏弱，在中轨下方', '价格偏强，在中轨上方', '接近上轨，可能超买')
+RSI_SIGNAL_BINS = np.array([30, 50, 70])
+RSI_SIGNAL_LABELS = ('超卖区域，可能反弹', '偏弱势', '偏强势', '超买区域，可能回调')
+# 下标与 macd_state 返回的状态编号对应
+MACD_SIGNAL_LABELS = ('多头强势，DIF在零轴上方', '空头强势，DIF在零轴下方', '金叉形成，短期看涨', '死叉形成，短期看跌')
+
+# 综合分析报告中的区间判断
+BOLL_BRIEF_BINS = np.array([20, 80])
+BOLL_BRIEF_LABELS = ('(接近下轨，超卖)\n', '(中间区域)\n', '(接近上轨，超买)\n')
+RSI_BRIEF_BINS = np.array([30, 70])
+RSI_BRIEF_LABELS = ('(超卖)\n', '(中性)\n', '(超买)\n')
+
+# 均线排列状态对应的描述（技术指标报告 / 综合分析报告）
+MA_TREND_LABELS = {
+    'bull': '多头排列，上升趋势',
+    'bear': '空头排列，下降趋势',
+    'mixed': '均线交织，震荡整理'
+}
+MA_TREND_BRIEF = {
+    'bull': '多头排列',
+    'bear': '空头排列',
+    'mixed': '震荡整理'
+}
+
+# 全球指数行情中优先展示的主要指数（名称子串合并为一个正则，每行只匹配一次）
+IMPORTANT_INDEX_RE = re.compile('|'.join(map(re.escape, [
+    '上证指数', '深证成指', '创业板指', '恒生指数',
+    '纳斯达克', '道琼斯', '标普500', '日经225', '德国DAX'
+])))
+
+# 中国指数行情中展示的主要指数代码
+IMPORTANT_INDEX_CODES = frozenset([
+    'sh000001', 'sz399001', 'sz399006', 'sh000300',
+    'sh000016', 'sh000905', 'sz399673'
+])
+
+# ETF分类的名称关键词，每个类别的关键词合并为一个正则，筛选时对名称列整体匹配一次
+CATEGORY_KEYWORDS = {
+    "index": ["沪深300", "中证500", "上证50", "创业板", "科创"],
+    "industry": ["医药", "消费", "金融", "科技", "新能源", "半导体", "军工", "银行", "证券"],
+    "commodity": ["黄金", "白银", "原油", "有色", "能源"],
+    "bond": ["国债", "企债", "信用债", "可转债"],
+    "cross_border": ["纳斯达克", "标普", "恒生", "日经", "德国", "法国", "港股"]
+}
+CATEGORY_RE = {
+    category: re.compile('|'.join(map(re.escape, keywords)))
+    for category, keywords in CATEGORY_KEYWORDS.items()
+}
+# 各类别在名称类别位掩码中对应的位
+CATEGORY_BITS = {category: 1 << i for i, category in enumerate(CATEGORY_KEYWORDS)}
+
+# 单次工具调用内并发执行的网络请求共用的线程池
+_IO_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+# 报告分隔线
+SEP40 = "=" * 40
+SEP50 = "=" * 50
+SEP60 = "=" * 60
+DASH35 = "-" * 35
+DASH60 = "-" * 60
+DASH80 = "-" * 80
+
+# 趋势分析报告中单个统计周期的模板
+PERIOD_TEMPLATE = (
+    SEP40 + "\n"
+    "【近{label}({weeks}周)技术指标统计】\n"
+    + SEP40 + "\n"
+    "  区间涨跌幅: {total_change}%\n"
+    "  最大回撤: {max_drawdown}%\n"
+    "  最大涨幅: {max_rally}%\n"
+    "  上涨周数/下跌周数: {up_weeks}/{down_weeks}\n"
+    "  RSI范围: {rsi_min} ~ {rsi_max} (均值{rsi_avg})\n"
+    "  RSI超卖/超买次数: {rsi_oversold_count}/{rsi_overbought_count}\n"
+    "  BOLL%B范围: {pb_min}% ~ {pb_max}% (均值{pb_avg}%)\n"
+    "  BOLL触下轨/上轨次数: {pb_near_lower}/{pb_near_upper}\n"
+    "  MACD金叉/死叉次数: {macd_cross_up}/{macd_cross_down}\n"
+    "  周期评分: {score}分\n"
+    "  特征: {judgments}\n\n"
+)
+
+# 趋势分析的历史统计周期（标签, 周数）
+TREND_PERIODS = (('3个月', 13), ('半年', 26), ('一年', 52))
+
+# 历史收益统计窗口（交易日）
+RETURN_WINDOWS = (('近一周', 5), ('近一月', 22), ('近三月', 66), ('近一年', 250))
+RETURN_OFFSETS = np.array([days for _, days in RETURN_WINDOWS])
+
+# 排行榜历史涨跌幅：回看交易日数、并发抓取线程数、候选ETF数量（按成交额从高到低选取）
+RANKING_OFFSETS = {'week': 5, 'month': 22}
+RANKING_MAX_WORKERS = 16
+# 每只候选的历史数据在数据缓存中只占一项（不限条数、按过期时间失效），有效期内重复排行不再请求；
+# 条数受限的报告缓存不存放历史数据，候选数量不受其上限约束
+RANKING_CANDIDATES = 200
+
+# 市场概览中展示的主要指数：上证指数、深证成指、创业板指、沪深300
+MARKET_INDEX_CODES = ('sh000001', 'sz399001', 'sz399006', 'sh000300')
+
+
+# ==================== 数据整理辅助函数 ====================
+
+def _format_realtime(row: dict, code: str) -> str:
+    """格式化ETF实时行情报告"""
+    parts = [f"=== {row['名称']}({code}) 实时行情 ===\n\n"]
+    parts.append(f"最新价: {row.get('最新价', 'N/A')}\n")
+    parts.append(f"涨跌额: {row.get('涨跌额', 'N/A')}\n")
+    parts.append(f"涨跌幅: {row.get('涨跌幅', 'N/A')}%\n")
+    parts.append(f"成交量: {row.get('成交量', 'N/A')}\n")
+    parts.append(f"成交额: {row.get('成交额', 'N/A')}\n")
+    parts.append(f"开盘价: {row.get('开盘价', 'N/A')}\n")
+    parts.append(f"最高价: {row.get('最高价', 'N/A')}\n")
+    parts.append(f"最低价: {row.get('最低价', 'N/A')}\n")
+    parts.append(f"昨收价: {row.get('昨收', 'N/A')}\n")
+    parts.append(f"换手率: {row.get('换手率', 'N/A')}%\n")
+    return ''.join(parts)
+
+
+def _columns(df: pd.DataFrame, *cols: str, default='N/A') -> list:
+    """按列取出DataFrame的ndarray，供按列zip逐行格式化；缺失的列以默认值填充"""
+    return [
+        df[col].to_numpy() if col in df.columns else np.full(len(df), default, dtype=object)
+        for col in cols
+    ]
+
+
+def _build_category_masks(spot: pd.DataFrame) -> np.ndarray:
+    """按 CATEGORY_RE 匹配每只ETF的名称，生成类别位掩码（位定义见 CATEGORY_BITS）"""
+    names = spot['名称']
+    masks = np.zeros(len(spot), dtype=np.uint8)
+    for category, pattern in CATEGORY_RE.items():
+        masks[names.str.contains(pattern, na=False).to_numpy()] |= CATEGORY_BITS[category]
+    return masks
+
+
+def _indicators_dict(df: pd.DataFrame) -> dict:
+    """计算K线数据（日线或周线）的各项技术指标，返回供各报告直接使用的字典
+
+    调用方保证数据不少于30条，末端取值无需再做长度判断。
+    """
+    indicators = {}
+    
+    # 各序列只取末端数值，统一转为ndarray按位置索引，避免逐个走 pandas 的 .iloc 标签机制
+    close = df['close'].to_numpy()
+    volume = df['volume'].to_numpy()
+    
+    # 价格信息
+    latest_price = close[-1]
+    week_ago_price = close[-2]
+    month_ago_price = close[-5]
+    
+    indicators['price_info'] = {
+        'latest_price': round(latest_price, 4),
+        'weekly_change_pct': round((latest_price - week_ago_price) / week_ago_price * 100, 2),
+        'monthly_change_pct': round((latest_price - month_ago_price) / month_ago_price * 100, 2)
+    }
+    
+    # BOLL/RSI/MACD 只需最新一期数值，一次性计算
+    tail = calculate_tail_indicators(close)
+    
+    # BOLL指标
+    indicators['boll'] = {
+        'upper': round(tail['upper'], 4),
+        'middle': round(tail['middle'], 4),
+        'lower': round(tail['lower'], 4),
+        'bandwidth': round(tail['bandwidth'], 2),
+        'percent_b': round(tail['percent_b'], 2)
+    }
+    
+    # 判断BOLL信号
+    pb = indicators['boll']['percent_b']
+    indicators['boll']['signal'] = lookup_zone(pb, BOLL_SIGNAL_BINS, BOLL_SIGNAL_LABELS)
+    
+    # RSI指标
+    rsi_6 = tail['rsi_6']
+    rsi_12 = tail['rsi_12']
+    rsi_14 = tail['rsi_14']
+    
+    indicators['rsi'] = {
+        'rsi_6': round(rsi_6, 2),
+        'rsi_12': round(rsi_12, 2),
+        'rsi_14': round(rsi_14, 2)
+    }
+    
+    indicators['rsi']['signal'] = lookup_zone(rsi_14, RSI_SIGNAL_BINS, RSI_SIGNAL_LABELS)
+    
+    # MACD指标
+    indicators['macd'] = {
+        'dif': round(tail['dif'], 4),
+        'dea': round(tail['dea'], 4),
+        'macd': round(tail['macd'], 4)
+    }
+    
+    state = macd_state(indicators['macd']['dif'], indicators['macd']['dea'])
+    indicators['macd']['signal'] = MACD_SIGNAL_LABELS[state]
+    
+    # KDJ指标
+    kdj = calculate_kdj_latest(df)
+    indicators['kdj'] = {
+        'k': round(kdj['k'], 2),
+        'd': round(kdj['d'], 2),
+        'j': round(kdj['j'], 2)
+    }
+    
+    k = indicators['kdj']['k']
+    d = indicators['kdj']['d']
+    if k < 20 and d < 20:
+        indicators['kdj']['signal'] = '超卖区域'
+    elif k > 80 and d > 80:
+        indicators['kdj']['signal'] = '超买区域'
+    elif k > d:
+        indicators['kdj']['signal'] = 'K上穿D，短期看涨'
+    else:
+        indicators['kdj']['signal'] = 'K下穿D，短期看跌'
+    
+    # 均线系统
+    indicators['ma'] = {
+        'ma5': round(calculate_ma_latest(close, 5), 4),
+        'ma10': round(calculate_ma_latest(close, 10), 4),
+        'ma20': round(calculate_ma_latest(close, 20), 4),
+        'ma60': round(calculate_ma_latest(close, 60), 4) if len(close) > 60 else None
+    }
+    
+    ma = indicators['ma']
+    ma_state = MA_ALIGNMENT_STATES[ma_alignment(latest_price, ma['ma5'], ma['ma10'], ma['ma20'])]
+    indicators['ma']['state'] = ma_state
+    indicators['ma']['trend'] = MA_TREND_LABELS[ma_state]
+    
+    # 成交量分析
+    vol_ma5 = calculate_ma_latest(volume, 5)
+    current_vol = volume[-1]
+    indicators['volume'] = {
+        'current': int(current_vol),
+        'ma5': int(vol_ma5),
+        'volume_ratio': round(current_vol / vol_ma5, 2) if vol_ma5 > 0 else 1
+    }
+    
+    return indicators
+
+
+def _cached_indicators_dict(code: str, period: str, df: pd.DataFrame) -> dict:
+    """按代码、周期和K线末端缓存 _indicators_dict 的结果
+
+    技术指标报告与综合分析使用同一份周线数据，共用一次指标计算。
+    返回的字典为共享对象，调用方只读不改。
+    """
+    cache_key = f"etf_indicator_dict_{code}_{period}_{len(df)}_{df['date'].iloc[-1]:%Y%m%d}"
+    cached = get_report_cache().get(cache_key, CACHE_TTL['etf_report'])
+    if cached is not None:
+        return cached
+
+    indicators = _indicators_dict(df)
+    get_report_cache().set(cache_key, indicators)
+    return indicators
+
+
+def _etf_name(code: str) -> str:
+    """按代码查ETF名称（带缓存的字典查找），行情获取失败或未找到时返回代码本身"""
+    try:
+        return get_cached_etf_name_map().get(code, code)
+    except Exception:
+        return code
+
+
+def _fetch_hist_quietly(code: str, days: int) -> Optional[pd.DataFrame]:
+    """获取ETF历史数据，失败时返回None（供批量并发抓取使用）"""
+    try:
+        return get_etf_hist_data(code, days=days)
+    except Exception:
+        return None
+
+
+def _top_n_positions(values: np.ndarray, n: int, largest: bool = True) -> np.ndarray:
+    """返回数组中最大（或最小）n个值的位置，按值排序，NaN排在最后，相同值保持原顺序
+
+    用 argpartition 做O(n)选择，只对选出的n个元素排序
+    """
+    if n <= 0:
+        return np.array([], dtype=int)
+    keys = -values if largest else values
+    if n >= len(keys):
+        return np.argsort(keys, kind='stable')
+    positions = np.sort(np.argpartition(keys, n)[:n])
+    return positions[np.argsort(keys[positions], kind='stable')]
+
+
+def _multi_etf_fetch(name: str) -> Optional[dict]:
+    """按名称取第一只匹配ETF，返回批量对比表所需的行情摘要和周线收盘价，无法获取时返回None"""
+    etf_list = search_etf_by_name(name)
+    if not etf_list or 'error' in etf_list[0]:
+        return None
+    
+    etf = etf_list[0]
+    code = etf['code']
+    
+    try:
+        df = get_etf_hist_data(code, days=120)
+        if len(df) < 30:
+            return None
+        
+        # 近期涨跌幅（收盘价只取一次为ndarray）
+        close = df['close'].to_numpy()
+        latest = close[-1]
+        week_change = round((latest - close[-5]) / close[-5] * 100, 2) if close.size >= 5 else None
+        month_change = round((latest - close[-22]) / close[-22] * 100, 2) if close.size >= 22 else None
+        
+        return {
+            'name': etf['name'][:12],
+            'code': code,
+            'price': latest,
+            'week_change': week_change,
+            'month_change': month_change,
+            # 只用周线收盘价，直接按周取末值，不做完整的周线聚合
+            'weekly_close': weekly_closes(df)
+        }
+    except Exception:
+        return None
+
+
+def _analyze_trend_core(code: str) -> dict:
+    """计算ETF多周期趋势分析的结构化结果（不生成文本），数据不足时抛出ValueError
+
+    返回 name/code/price/current/periods/score/trend/suggestion，
+    periods 为 (标签, 统计结果, 周期评分, 特征列表) 的列表，供报告渲染或其他工具直接使用。
+    """
+    # 获取历史数据（2年日线数据）
+    df = get_etf_hist_data(code, days=730)
+    
+    if df.empty or len(df) < 60:
+        raise ValueError("数据量不足，无法分析趋势")
+    
+    # 转换为周线数据（带缓存）
+    weekly_df = get_etf_weekly_data(code, days=730)
+    
+    if len(weekly_df) < 30:
+        raise ValueError("周线数据量不足，无法分析趋势")
+    
+    etf_name = _etf_name(code)
+    
+    # ========== 1. 当前技术指标 ==========
+    current_score_data = calculate_period_score(weekly_df)
+    if not current_score_data:
+        raise ValueError("计算当前指标失败")
+    
+    # ========== 2. 历史周期分析 ==========
+    # 指标序列只计算一次，各统计窗口切片复用；13周约3个月，26周约半年，52周约一年
+    arrays = calculate_indicator_arrays(weekly_df)
+    periods = []
+    for label, weeks in TREND_PERIODS:
+        stats = analyze_historical_indicators(weekly_df, weeks, arrays)
+        score, judgments = get_period_trend_judgment(stats)
+        periods.append((label, stats, score, judgments))
+    
+    # ========== 3. 综合评分 ==========
+    # 当前指标权重40%，近3月20%，近半年20%，近一年20%
+    current_score = current_score_data['score']
+    score_3m, score_6m, score_1y = (score for _, _, score, _ in periods)
+    comprehensive_score = int(current_score * 0.4 + score_3m * 0.2 + score_6m * 0.2 + score_1y * 0.2)
+    
+    # 趋势判断
+    if comprehensive_score >= 40:
+        trend = "强势上涨趋势"
+        suggestion = "可考虑持有或逢低加仓"
+    elif comprehensive_score >= 15:
+        trend = "偏多震荡趋势"
+        suggestion = "可考虑轻仓参与，注意回调风险"
+    elif comprehensive_score >= -15:
+        trend = "横盘整理"
+        suggestion = "建议观望，等待方向明确"
+    elif comprehensive_score >= -40:
+        trend = "偏空震荡趋势"
+        suggestion = "建议减仓或观望，谨慎操作"
+    else:
+        trend = "弱势下跌趋势"
+        suggestion = "建议回避或空仓等待企稳"
+    
+    return {
+        'name': etf_name,
+        'code': code,
+        'price': arrays['close'][-1],
+        'current': current_score_data,
+        'periods': periods,
+        'score': comprehensive_score,
+        'trend': trend,
+        'suggestion': suggestion
+    }
+
+
+def _format_trend_body(data: dict) -> str:
+    """将 _analyze_trend_core 的结果渲染为趋势分析报告正文（不含报告头）"""
+    latest_price = data['price']
+    current = data['current']
+    
+    parts = [f"【当前价格】{latest_price:.4f}\n\n"]
+    
+    # 当前指标
+    parts.append(SEP40 + "\n")
+    parts.append("【当前周线技术指标】\n")
+    parts.append(SEP40 + "\n")
+    parts.append(f"  BOLL %B: {current['percent_b']:.1f}%\n")
+    parts.append(f"  RSI(14): {current['rsi']:.1f}\n")
+    parts.append(f"  MACD DIF: {current['dif']:.4f}, DEA: {current['dea']:.4f}\n")
+    parts.append(f"  MA5周: {current['ma5']:.4f} {'↑' if latest_price > current['ma5'] else '↓'}\n")
+    parts.append(f"  MA10周: {current['ma10']:.4f} {'↑' if latest_price > current['ma10'] else '↓'}\n")
+    parts.append(f"  MA20周: {current['ma20']:.4f} {'↑' if latest_price > current['ma20'] else '↓'}\n")
+    parts.append(f"  量比: {current['volume_ratio']:.2f}\n")
+    parts.append(f"  当前评分: {current['score']}分\n")
+    parts.append(f"  信号: {', '.join(current['details'])}\n\n")
+    
+    # 近3个月/半年/一年统计
+    for label, stats, score, judgments in data['periods']:
+        parts.append(PERIOD_TEMPLATE.format_map(
+            {**stats, 'label': label, 'score': score, 'judgments': ', '.join(judgments)}
+        ))
+    
+    # 综合评分
+    parts.append(SEP60 + "\n")
+    parts.append("【综合评分与趋势判断】\n")
+    parts.append(SEP60 + "\n")
+    parts.append(f"  当前指标评分(权重40%): {current['score']}分\n")
+    for label, _, score, _ in data['periods']:
+        parts.append(f"  近{label}评分(权重20%): {score}分\n")
+    parts.append(f"  ─────────────────────\n")
+    parts.append(f"  【综合评分】{data['score']}分\n")
+    parts.append(f"  【趋势判断】{data['trend']}\n")
+    parts.append(f"  【操作建议】{data['suggestion']}\n\n")
+    
+    # 风险提示
+    parts.append("【风险提示】\n")
+    parts.append("  • 以上分析基于周线数据，适合中长期投资参考\n")
+    parts.append("  • 历史表现不代表未来收益，投资有风险\n")
+    parts.append("  • 建议结合基本面和宏观环境综合判断\n")
+    
+    return ''.join(parts)
+
+
+def _iter_calendar_lines(df: pd.DataFrame):
+    """逐条生成经济日历事件的文本行，由调用方决定拼接或截断"""
+    for row in df.to_dict('records'):
+        yield f"【{row.get('时间', 'N/A')}】{row.get('地区', 'N/A')} - {row.get('事件', 'N/A')}\n"
+        prev = row.get('前值')
+        if prev:
+            yield f"  前值: {prev} | 预期: {row.get('预期', 'N/A')} | 公布: {row.get('公布', 'N/A')}\n"
+        yield f"  重要性: {row.get('重要性', 'N/A')}\n\n"
+
+
+def _trend_report_header(etf_name: str, code: str, now: datetime) -> str:
+    """生成趋势分析报告头（含实时分析时间）"""
+    return (
+        f"{SEP60}\n"
+        f"  {etf_name}({code}) 多周期技术指标分析报告\n"
+        f"  分析时间: {now:%Y-%m-%d %H:%M}\n"
+        f"{SEP60}\n\n"
+    )
+
+
+def _returns_dict(close: np.ndarray) -> dict:
+    """根据日线收盘价计算各窗口历史收益率（%），数据不足的窗口不返回
+
+    各窗口的基准价一次按位置取出，统一计算；窗口按天数升序排列，有效窗口为前缀。
+    """
+    offsets = RETURN_OFFSETS[RETURN_OFFSETS <= close.size]
+    base_prices = close[-offsets]
+    changes = np.round((close[-1] - base_prices) / base_prices * 100, 2)
+    return {label: change for (label, _), change in zip(RETURN_WINDOWS, changes)}
+
+
 def register_tools(mcp):
     """注册所有 MCP 工具"""
     
@@ -57,12 +539,12 @@ def register_tools(mcp):
         if 'error' in results[0]:
             return f"搜索出错: {results[0]['error']}"
         
-        output = f"搜索'{name}'找到以下ETF:\n\n"
+        parts = [f"搜索'{name}'找到以下ETF:\n\n"]
         for i, etf in enumerate(results, 1):
-            output += f"{i}. {etf['name']} ({etf['code']})\n"
-            output += f"   最新价: {etf['latest_price']} | 涨跌幅: {etf['change_pct']}%\n"
+            parts.append(f"{i}. {etf['name']} ({etf['code']})\n")
+            parts.append(f"   最新价: {etf['latest_price']} | 涨跌幅: {etf['change_pct']}%\n")
         
-        return output
+        return ''.join(parts)
 
     @mcp.tool()
     def get_etf_technical_indicators(code: str, period: str = "weekly") -> str:
@@ -77,6 +559,12 @@ def register_tools(mcp):
             包含各项技术指标的详细分析报告
         """
         try:
+            # 同一交易日内的重复查询直接返回已生成的报告
+            cache_key = f"etf_indicators_{code}_{period}_{datetime.now():%Y%m%d}"
+            cached = get_report_cache().get(cache_key, CACHE_TTL['etf_report'])
+            if cached is not None:
+                return cached
+            
             # 获取历史数据
             df = get_etf_hist_data(code, days=365)
             
@@ -85,168 +573,47 @@ def register_tools(mcp):
             
             # 根据周期转换数据
             if period == "weekly":
-                df = resample_to_weekly(df)
+                df = get_etf_weekly_data(code, days=365)
             
             if len(df) < 30:
                 return f"数据量不足，无法计算技术指标"
             
-            # 获取ETF名称
-            try:
-                etf_info = get_cached_etf_spot()
-                name_row = etf_info[etf_info['代码'] == code]
-                etf_name = name_row['名称'].values[0] if not name_row.empty else code
-            except:
-                etf_name = code
-            
-            indicators = {}
-            
-            # 价格信息
-            latest_price = df['close'].iloc[-1]
-            week_ago_price = df['close'].iloc[-2] if len(df) > 1 else latest_price
-            month_ago_price = df['close'].iloc[-5] if len(df) > 4 else latest_price
-            
-            indicators['price_info'] = {
-                'latest_price': round(latest_price, 4),
-                'weekly_change_pct': round((latest_price - week_ago_price) / week_ago_price * 100, 2),
-                'monthly_change_pct': round((latest_price - month_ago_price) / month_ago_price * 100, 2)
-            }
-            
-            # BOLL指标
-            boll = calculate_boll(df)
-            indicators['boll'] = {
-                'upper': round(boll['upper'].iloc[-1], 4),
-                'middle': round(boll['middle'].iloc[-1], 4),
-                'lower': round(boll['lower'].iloc[-1], 4),
-                'bandwidth': round(boll['bandwidth'].iloc[-1], 2),
-                'percent_b': round(boll['percent_b'].iloc[-1], 2)
-            }
-            
-            # 判断BOLL信号
-            pb = indicators['boll']['percent_b']
-            if pb < 20:
-                indicators['boll']['signal'] = '接近下轨，可能超卖'
-            elif pb > 80:
-                indicators['boll']['signal'] = '接近上轨，可能超买'
-            elif pb < 50:
-                indicators['boll']['signal'] = '价格偏弱，在中轨下方'
-            else:
-                indicators['boll']['signal'] = '价格偏强，在中轨上方'
-            
-            # RSI指标
-            rsi_6 = calculate_rsi(df['close'], 6).iloc[-1]
-            rsi_12 = calculate_rsi(df['close'], 12).iloc[-1]
-            rsi_14 = calculate_rsi(df['close'], 14).iloc[-1]
-            
-            indicators['rsi'] = {
-                'rsi_6': round(rsi_6, 2),
-                'rsi_12': round(rsi_12, 2),
-                'rsi_14': round(rsi_14, 2)
-            }
-            
-            if rsi_14 < 30:
-                indicators['rsi']['signal'] = '超卖区域，可能反弹'
-            elif rsi_14 > 70:
-                indicators['rsi']['signal'] = '超买区域，可能回调'
-            elif rsi_14 < 50:
-                indicators['rsi']['signal'] = '偏弱势'
-            else:
-                indicators['rsi']['signal'] = '偏强势'
-            
-            # MACD指标
-            macd = calculate_macd(df['close'])
-            indicators['macd'] = {
-                'dif': round(macd['dif'].iloc[-1], 4),
-                'dea': round(macd['dea'].iloc[-1], 4),
-                'macd': round(macd['macd'].iloc[-1], 4)
-            }
-            
-            dif = indicators['macd']['dif']
-            dea = indicators['macd']['dea']
-            if dif > dea and dif > 0:
-                indicators['macd']['signal'] = '多头强势，DIF在零轴上方'
-            elif dif < dea and dif < 0:
-                indicators['macd']['signal'] = '空头强势，DIF在零轴下方'
-            elif dif > dea:
-                indicators['macd']['signal'] = '金叉形成，短期看涨'
-            else:
-                indicators['macd']['signal'] = '死叉形成，短期看跌'
-            
-            # KDJ指标
-            kdj = calculate_kdj(df)
-            indicators['kdj'] = {
-                'k': round(kdj['k'].iloc[-1], 2),
-                'd': round(kdj['d'].iloc[-1], 2),
-                'j': round(kdj['j'].iloc[-1], 2)
-            }
-            
-            k = indicators['kdj']['k']
-            d = indicators['kdj']['d']
-            if k < 20 and d < 20:
-                indicators['kdj']['signal'] = '超卖区域'
-            elif k > 80 and d > 80:
-                indicators['kdj']['signal'] = '超买区域'
-            elif k > d:
-                indicators['kdj']['signal'] = 'K上穿D，短期看涨'
-            else:
-                indicators['kdj']['signal'] = 'K下穿D，短期看跌'
-            
-            # 均线系统
-            indicators['ma'] = {
-                'ma5': round(calculate_ma(df['close'], 5).iloc[-1], 4),
-                'ma10': round(calculate_ma(df['close'], 10).iloc[-1], 4),
-                'ma20': round(calculate_ma(df['close'], 20).iloc[-1], 4),
-                'ma60': round(calculate_ma(df['close'], min(60, len(df)-1)).iloc[-1], 4) if len(df) > 60 else None
-            }
-            
-            ma5 = indicators['ma']['ma5']
-            ma10 = indicators['ma']['ma10']
-            ma20 = indicators['ma']['ma20']
-            if latest_price > ma5 > ma10 > ma20:
-                indicators['ma']['trend'] = '多头排列，上升趋势'
-            elif latest_price < ma5 < ma10 < ma20:
-                indicators['ma']['trend'] = '空头排列，下降趋势'
-            else:
-                indicators['ma']['trend'] = '均线交织，震荡整理'
+            etf_name = _etf_name(code)
             
-            # 成交量分析
-            vol_ma5 = calculate_ma(df['volume'], 5).iloc[-1]
-            current_vol = df['volume'].iloc[-1]
-            indicators['volume'] = {
-                'current': int(current_vol),
-                'ma5': int(vol_ma5),
-                'volume_ratio': round(current_vol / vol_ma5, 2) if vol_ma5 > 0 else 1
-            }
+            indicators = _cached_indicators_dict(code, period, df)
             
             # 生成信号汇总
             signals = get_indicator_signals(indicators)
             
             # 格式化输出
             period_name = "周线" if period == "weekly" else "日线"
-            output = format_indicator_summary(indicators, f"{etf_name}({code}) {period_name}")
+            parts = [format_indicator_summary(indicators, f"{etf_name}({code}) {period_name}")]
             
-            output += "=== 信号汇总 ===\n\n"
+            parts.append("=== 信号汇总 ===\n\n")
             
             if signals['bullish']:
-                output += "【看涨信号】\n"
+                parts.append("【看涨信号】\n")
                 for s in signals['bullish']:
-                    output += f"  ✓ {s}\n"
-                output += "\n"
+                    parts.append(f"  ✓ {s}\n")
+                parts.append("\n")
             
             if signals['bearish']:
-                output += "【看跌信号】\n"
+                parts.append("【看跌信号】\n")
                 for s in signals['bearish']:
-                    output += f"  ✗ {s}\n"
-                output += "\n"
+                    parts.append(f"  ✗ {s}\n")
+                parts.append("\n")
             
             if signals['neutral']:
-                output += "【中性信号】\n"
+                parts.append("【中性信号】\n")
                 for s in signals['neutral']:
-                    output += f"  - {s}\n"
-                output += "\n"
+                    parts.append(f"  - {s}\n")
+                parts.append("\n")
             
-            output += f"【综合判断】{signals['overall']}\n"
+            parts.append(f"【综合判断】{signals['overall']}\n")
             
-            return output
+            report = ''.join(parts)
+            get_report_cache().set(cache_key, report)
+            return report
             
         except Exception as e:
             return f"获取技术指标失败: {str(e)}"
@@ -263,25 +630,12 @@ def register_tools(mcp):
             ETF的实时行情数据
         """
         try:
-            etf_df = get_cached_etf_spot()
-            etf_row = etf_df[etf_df['代码'] == code]
+            row = get_cached_etf_row(code)
             
-            if etf_row.empty:
+            if row is None:
                 return f"未找到代码为 {code} 的ETF"
             
-            row = etf_row.iloc[0]
-            
-            output = f"=== {row['名称']}({code}) 实时行情 ===\n\n"
-            output += f"最新价: {row.get('最新价', 'N/A')}\n"
-            output += f"涨跌额: {row.get('涨跌额', 'N/A')}\n"
-            output += f"涨跌幅: {row.get('涨跌幅', 'N/A')}%\n"
-            output += f"成交量: {row.get('成交量', 'N/A')}\n"
-            output += f"成交额: {row.get('成交额', 'N/A')}\n"
-            output += f"开盘价: {row.get('开盘价', 'N/A')}\n"
-            output += f"最高价: {row.get('最高价', 'N/A')}\n"
-            output += f"最低价: {row.get('最低价', 'N/A')}\n"
-            output += f"昨收价: {row.get('昨收', 'N/A')}\n"
-            output += f"换手率: {row.get('换手率', 'N/A')}%\n"
+            output = _format_realtime(row, code)
             
             return output
             
@@ -302,33 +656,29 @@ def register_tools(mcp):
         try:
             if index_type == "global":
                 df = get_cached_index_global_spot()
-                output = "=== 全球主要指数实时行情 ===\n\n"
+                parts = ["=== 全球主要指数实时行情 ===\n\n"]
+                line_count = 3  # 当前报告按换行切分的行数
                 
-                # 选取主要指数
-                important_indices = ['上证指数', '深证成指', '创业板指', '恒生指数', 
-                                   '纳斯达克', '道琼斯', '标普500', '日经225', '德国DAX']
-                
-                for _, row in df.iterrows():
+                # 选取主要指数，报告不足25行时其余指数也依次列出
+                for row in df.to_dict('records'):
                     name = row.get('名称', '')
-                    if any(idx in name for idx in important_indices) or len(output.split('\n')) < 25:
-                        output += f"{row.get('名称', 'N/A')}: {row.get('最新价', 'N/A')} "
-                        output += f"({row.get('涨跌幅', 'N/A')}%)\n"
+                    if IMPORTANT_INDEX_RE.search(name) or line_count < 25:
+                        parts.append(f"{row.get('名称', 'N/A')}: {row.get('最新价', 'N/A')} ")
+                        parts.append(f"({row.get('涨跌幅', 'N/A')}%)\n")
+                        line_count += 1
             else:
                 df = get_cached_index_spot_sina()
-                output = "=== 中国主要指数实时行情 ===\n\n"
+                parts = ["=== 中国主要指数实时行情 ===\n\n"]
                 
                 # 主要指数代码
-                important_codes = ['sh000001', 'sz399001', 'sz399006', 'sh000300', 
-                                 'sh000016', 'sh000905', 'sz399673']
-                
-                for _, row in df.iterrows():
+                for row in df.to_dict('records'):
                     code = row.get('代码', '')
-                    if code in important_codes:
-                        output += f"{row.get('名称', 'N/A')}({code}): {row.get('最新价', 'N/A')} "
+                    if code in IMPORTANT_INDEX_CODES:
+                        parts.append(f"{row.get('名称', 'N/A')}({code}): {row.get('最新价', 'N/A')} ")
                         change_pct = row.get('涨跌幅', 0)
-                        output += f"({change_pct}%)\n"
+                        parts.append(f"({change_pct}%)\n")
             
-            return output
+            return ''.join(parts)
             
         except Exception as e:
             return f"获取指数行情失败: {str(e)}"
@@ -354,22 +704,25 @@ def register_tools(mcp):
             # 取最近N天
             df = df.tail(days)
             
-            output = f"=== {symbol} 最近{days}天历史数据 ===\n\n"
+            parts = [f"=== {symbol} 最近{days}天历史数据 ===\n\n"]
             
-            # 统计信息
-            latest = df.iloc[-1]
-            first = df.iloc[0]
+            # 统计信息：各列取一次ndarray，按位置计算，不逐项走 pandas 索引
+            close = df['close'].to_numpy(dtype=float)
+            high = df['high'].to_numpy(dtype=float)
+            low = df['low'].to_numpy(dtype=float)
+            high_pos = np.nanargmax(high)
+            low_pos = np.nanargmin(low)
             
-            output += f"期间涨跌幅: {round((latest['close'] - first['close']) / first['close'] * 100, 2)}%\n"
-            output += f"最高价: {df['high'].max()} (日期: {df.loc[df['high'].idxmax(), 'date']})\n"
-            output += f"最低价: {df['low'].min()} (日期: {df.loc[df['low'].idxmin(), 'date']})\n"
-            output += f"平均成交量: {int(df['volume'].mean())}\n\n"
+            parts.append(f"期间涨跌幅: {round((close[-1] - close[0]) / close[0] * 100, 2)}%\n")
+            parts.append(f"最高价: {high[high_pos]} (日期: {df['date'].iloc[high_pos]})\n")
+            parts.append(f"最低价: {low[low_pos]} (日期: {df['date'].iloc[low_pos]})\n")
+            parts.append(f"平均成交量: {int(np.nanmean(df['volume'].to_numpy(dtype=float)))}\n\n")
             
-            output += "最近5个交易日:\n"
-            for _, row in df.tail(5).iterrows():
-                output += f"  {row['date']}: 开{row['open']} 高{row['high']} 低{row['low']} 收{row['close']}\n"
+            parts.append("最近5个交易日:\n")
+            for row in df.tail(5).itertuples(index=False):
+                parts.append(f"  {row.date}: 开{row.open} 高{row.high} 低{row.low} 收{row.close}\n")
             
-            return output
+            return ''.join(parts)
             
         except Exception as e:
             return f"获取指数历史数据失败: {str(e)}"
@@ -392,47 +745,47 @@ def register_tools(mcp):
             对应宏观经济指标数据
         """
         try:
-            output = ""
+            parts = []
             
             if indicator == "m2":
                 df = ak.macro_china_m2_yearly()
-                output = "=== M2货币供应年率 ===\n\n"
-                for _, row in df.tail(12).iterrows():
-                    output += f"{row.get('日期', row.get('date', 'N/A'))}: {row.get('今值', row.get('value', 'N/A'))}%\n"
+                parts = ["=== M2货币供应年率 ===\n\n"]
+                for row in df.tail(12).to_dict('records'):
+                    parts.append(f"{row.get('日期', row.get('date', 'N/A'))}: {row.get('今值', row.get('value', 'N/A'))}%\n")
                     
             elif indicator == "exports":
                 df = ak.macro_china_exports_yoy()
-                output = "=== 以美元计算出口年率 ===\n\n"
-                for _, row in df.tail(12).iterrows():
-                    output += f"{row.get('日期', row.get('date', 'N/A'))}: {row.get('今值', row.get('value', 'N/A'))}%\n"
+                parts = ["=== 以美元计算出口年率 ===\n\n"]
+                for row in df.tail(12).to_dict('records'):
+                    parts.append(f"{row.get('日期', row.get('date', 'N/A'))}: {row.get('今值', row.get('value', 'N/A'))}%\n")
                     
             elif indicator == "fx_reserves":
                 df = ak.macro_china_fx_reserves_yearly()
-                output = "=== 外汇储备(亿美元) ===\n\n"
-                for _, row in df.tail(12).iterrows():
-                    output += f"{row.get('日期', row.get('date', 'N/A'))}: {row.get('今值', row.get('value', 'N/A'))}\n"
+                parts = ["=== 外汇储备(亿美元) ===\n\n"]
+                for row in df.tail(12).to_dict('records'):
+                    parts.append(f"{row.get('日期', row.get('date', 'N/A'))}: {row.get('今值', row.get('value', 'N/A'))}\n")
                     
             elif indicator == "enterprise_boom":
                 df = ak.macro_china_enterprise_boom_index()
-                output = "=== 企业景气及企业家信心指数 ===\n\n"
-                for _, row in df.tail(8).iterrows():
-                    output += f"{row.get('季度', 'N/A')}: 景气指数{row.get('企业景气指数', 'N/A')} 信心指数{row.get('企业家信心指数', 'N/A')}\n"
+                parts = ["=== 企业景气及企业家信心指数 ===\n\n"]
+                for row in df.tail(8).to_dict('records'):
+                    parts.append(f"{row.get('季度', 'N/A')}: 景气指数{row.get('企业景气指数', 'N/A')} 信心指数{row.get('企业家信心指数', 'N/A')}\n")
                     
             elif indicator == "commodity_price":
                 df = ak.macro_china_commodity_price_index()
-                output = "=== 大宗商品价格指数 ===\n\n"
-                for _, row in df.tail(12).iterrows():
-                    output += f"{row.get('日期', 'N/A')}: {row.get('指数值', row.get('value', 'N/A'))}\n"
+                parts = ["=== 大宗商品价格指数 ===\n\n"]
+                for row in df.tail(12).to_dict('records'):
+                    parts.append(f"{row.get('日期', 'N/A')}: {row.get('指数值', row.get('value', 'N/A'))}\n")
                     
             elif indicator == "vegetable_basket":
                 df = ak.macro_china_vegetable_basket()
-                output = "=== 菜篮子产品批发价格指数 ===\n\n"
-                for _, row in df.tail(12).iterrows():
-                    output += f"{row.get('日期', 'N/A')}: {row.get('指数值', row.get('value', 'N/A'))}\n"
+                parts = ["=== 菜篮子产品批发价格指数 ===\n\n"]
+                for row in df.tail(12).to_dict('records'):
+                    parts.append(f"{row.get('日期', 'N/A')}: {row.get('指数值', row.get('value', 'N/A'))}\n")
             else:
                 return f"不支持的指标类型: {indicator}。支持的类型: m2, exports, fx_reserves, enterprise_boom, commodity_price, vegetable_basket"
             
-            return output
+            return ''.join(parts)
             
         except Exception as e:
             return f"获取宏观经济数据失败: {str(e)}"
@@ -457,15 +810,7 @@ def register_tools(mcp):
             if df.empty:
                 return f"{date} 没有重要经济事件"
             
-            output = f"=== {date} 全球宏观经济事件 ===\n\n"
-            
-            for _, row in df.iterrows():
-                output += f"【{row.get('时间', 'N/A')}】{row.get('地区', 'N/A')} - {row.get('事件', 'N/A')}\n"
-                if row.get('前值'):
-                    output += f"  前值: {row.get('前值', 'N/A')} | 预期: {row.get('预期', 'N/A')} | 公布: {row.get('公布', 'N/A')}\n"
-                output += f"  重要性: {row.get('重要性', 'N/A')}\n\n"
-            
-            return output
+            return f"=== {date} 全球宏观经济事件 ===\n\n" + ''.join(_iter_calendar_lines(df))
             
         except Exception as e:
             return f"获取经济日历失败: {str(e)}"
@@ -493,133 +838,73 @@ def register_tools(mcp):
             code = etf['code']
             etf_name = etf['name']
             
-            output = f"{'='*50}\n"
-            output += f"  {etf_name}({code}) 综合分析报告\n"
-            output += f"  生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
-            output += f"{'='*50}\n\n"
+            # 历史数据需网络请求，提前提交到后台线程，与实时行情部分的处理重叠
+            weekly_future = _IO_EXECUTOR.submit(get_etf_weekly_data, code, 365)
+            
+            parts = [SEP50 + "\n"]
+            parts.append(f"  {etf_name}({code}) 综合分析报告\n")
+            parts.append(f"  生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
+            parts.append(SEP50 + "\n\n")
             
-            # 2. 实时行情
+            # 2. 实时行情（只对网络获取做异常保护，获取失败时跳过本节）
             try:
-                etf_df = get_cached_etf_spot()
-                etf_row = etf_df[etf_df['代码'] == code]
-                
-                if not etf_row.empty:
-                    row = etf_row.iloc[0]
-                    output += "【实时行情】\n"
-                    output += f"  最新价: {row.get('最新价', 'N/A')}\n"
-                    output += f"  涨跌幅: {row.get('涨跌幅', 'N/A')}%\n"
-                    output += f"  成交额: {row.get('成交额', 'N/A')}\n"
-                    output += f"  换手率: {row.get('换手率', 'N/A')}%\n\n"
-            except:
-                pass
+                row = get_cached_etf_row(code)
+            except Exception:
+                row = None
+            
+            if row is not None:
+                parts.append("【实时行情】\n")
+                parts.append(f"  最新价: {row.get('最新价', 'N/A')}\n")
+                parts.append(f"  涨跌幅: {row.get('涨跌幅', 'N/A')}%\n")
+                parts.append(f"  成交额: {row.get('成交额', 'N/A')}\n")
+                parts.append(f"  换手率: {row.get('换手率', 'N/A')}%\n\n")
             
             # 3. 周线技术指标
             try:
-                df = get_etf_hist_data(code, days=365)
-                weekly_df = resample_to_weekly(df)
+                weekly_df = weekly_future.result()
                 
-                if len(weekly_df) >= 30:
-                    output += "【周线技术指标】\n"
-                    
-                    # BOLL
-                    boll = calculate_boll(weekly_df)
-                    pb = round(boll['percent_b'].iloc[-1], 2)
-                    output += f"  BOLL %B: {pb}% "
-                    if pb < 20:
-                        output += "(接近下轨，超卖)\n"
-                    elif pb > 80:
-                        output += "(接近上轨，超买)\n"
-                    else:
-                        output += "(中间区域)\n"
-                    
-                    # RSI
-                    rsi_14 = round(calculate_rsi(weekly_df['close'], 14).iloc[-1], 2)
-                    output += f"  RSI(14): {rsi_14} "
-                    if rsi_14 < 30:
-                        output += "(超卖)\n"
-                    elif rsi_14 > 70:
-                        output += "(超买)\n"
-                    else:
-                        output += "(中性)\n"
-                    
-                    # MACD
-                    macd = calculate_macd(weekly_df['close'])
-                    dif = round(macd['dif'].iloc[-1], 4)
-                    dea = round(macd['dea'].iloc[-1], 4)
-                    output += f"  MACD DIF: {dif}, DEA: {dea} "
-                    if dif > dea:
-                        output += "(金叉/多头)\n"
-                    else:
-                        output += "(死叉/空头)\n"
-                    
-                    # KDJ
-                    kdj = calculate_kdj(weekly_df)
-                    k = round(kdj['k'].iloc[-1], 2)
-                    d = round(kdj['d'].iloc[-1], 2)
-                    j = round(kdj['j'].iloc[-1], 2)
-                    output += f"  KDJ K:{k} D:{d} J:{j}\n"
+                if weekly_df.empty:
+                    parts.append("  技术指标计算失败: 未能获取历史数据\n\n")
+                elif len(weekly_df) >= 30:
+                    indicators = _cached_indicators_dict(code, 'weekly', weekly_df)
+                    boll = indicators['boll']
+                    rsi = indicators['rsi']
+                    macd = indicators['macd']
+                    kdj = indicators['kdj']
+                    ma = indicators['ma']
                     
-                    # 均线
-                    ma5 = round(calculate_ma(weekly_df['close'], 5).iloc[-1], 4)
-                    ma10 = round(calculate_ma(weekly_df['close'], 10).iloc[-1], 4)
-                    ma20 = round(calculate_ma(weekly_df['close'], 20).iloc[-1], 4)
-                    latest = weekly_df['close'].iloc[-1]
-                    output += f"  均线: MA5={ma5}, MA10={ma10}, MA20={ma20}\n"
-                    
-                    if latest > ma5 > ma10 > ma20:
-                        output += "  趋势: 多头排列\n"
-                    elif latest < ma5 < ma10 < ma20:
-                        output += "  趋势: 空头排列\n"
-                    else:
-                        output += "  趋势: 震荡整理\n"
-                    
-                    output += "\n"
+                    parts.append("【周线技术指标】\n")
+                    parts.append(f"  BOLL %B: {boll['percent_b']}% ")
+                    parts.append(lookup_zone(boll['percent_b'], BOLL_BRIEF_BINS, BOLL_BRIEF_LABELS))
+                    parts.append(f"  RSI(14): {rsi['rsi_14']} ")
+                    parts.append(lookup_zone(rsi['rsi_14'], RSI_BRIEF_BINS, RSI_BRIEF_LABELS))
+                    parts.append(f"  MACD DIF: {macd['dif']}, DEA: {macd['dea']} ")
+                    parts.append("(金叉/多头)\n" if macd['dif'] > macd['dea'] else "(死叉/空头)\n")
+                    parts.append(f"  KDJ K:{kdj['k']} D:{kdj['d']} J:{kdj['j']}\n")
+                    parts.append(f"  均线: MA5={ma['ma5']}, MA10={ma['ma10']}, MA20={ma['ma20']}\n")
+                    parts.append(f"  趋势: {MA_TREND_BRIEF[ma['state']]}\n")
+                    parts.append("\n")
             except Exception as e:
-                output += f"  技术指标计算失败: {str(e)}\n\n"
+                parts.append(f"  技术指标计算失败: {str(e)}\n\n")
             
             # 4. 历史表现
-            try:
-                if len(df) > 0:
-                    output += "【历史表现】\n"
-                    latest_price = df['close'].iloc[-1]
-                    
-                    # 近一周
-                    if len(df) >= 5:
-                        week_price = df['close'].iloc[-5]
-                        week_change = round((latest_price - week_price) / week_price * 100, 2)
-                        output += f"  近一周: {week_change}%\n"
-                    
-                    # 近一月
-                    if len(df) >= 22:
-                        month_price = df['close'].iloc[-22]
-                        month_change = round((latest_price - month_price) / month_price * 100, 2)
-                        output += f"  近一月: {month_change}%\n"
-                    
-                    # 近三月
-                    if len(df) >= 66:
-                        quarter_price = df['close'].iloc[-66]
-                        quarter_change = round((latest_price - quarter_price) / quarter_price * 100, 2)
-                        output += f"  近三月: {quarter_change}%\n"
-                    
-                    # 近一年
-                    if len(df) >= 250:
-                        year_price = df['close'].iloc[-250]
-                        year_change = round((latest_price - year_price) / year_price * 100, 2)
-                        output += f"  近一年: {year_change}%\n"
-                    
-                    output += "\n"
-            except:
-                pass
+            # 只需日线收盘价一列（周线抓取时已缓存）；获取失败或无数据时跳过本节
+            hist_df = _fetch_hist_quietly(code, 365)
+            if hist_df is not None and len(hist_df) > 0:
+                parts.append("【历史表现】\n")
+                for label, change in _returns_dict(hist_df['close'].to_numpy()).items():
+                    parts.append(f"  {label}: {change}%\n")
+                parts.append("\n")
             
             # 5. 综合建议
-            output += "【分析要点】\n"
-            output += "  1. 以上技术指标基于周线数据，适合中期判断\n"
-            output += "  2. RSI<30或BOLL%B<20可能是超卖信号\n"
-            output += "  3. RSI>70或BOLL%B>80可能是超买信号\n"
-            output += "  4. MACD金叉配合均线多头排列是较强的看涨信号\n"
-            output += "  5. 建议结合宏观经济环境和行业基本面综合判断\n"
+            parts.append("【分析要点】\n")
+            parts.append("  1. 以上技术指标基于周线数据，适合中期判断\n")
+            parts.append("  2. RSI<30或BOLL%B<20可能是超卖信号\n")
+            parts.append("  3. RSI>70或BOLL%B>80可能是超买信号\n")
+            parts.append("  4. MACD金叉配合均线多头排列是较强的看涨信号\n")
+            parts.append("  5. 建议结合宏观经济环境和行业基本面综合判断\n")
             
-            return output
+            return ''.join(parts)
             
         except Exception as e:
             return f"综合分析失败: {str(e)}"
@@ -642,37 +927,27 @@ def register_tools(mcp):
             ETF列表
         """
         try:
-            df = get_cached_etf_spot()
-            
-            if category != "all":
-                category_keywords = {
-                    "index": ["沪深300", "中证500", "上证50", "创业板", "科创"],
-                    "industry": ["医药", "消费", "金融", "科技", "新能源", "半导体", "军工", "银行", "证券"],
-                    "commodity": ["黄金", "白银", "原油", "有色", "能源"],
-                    "bond": ["国债", "企债", "信用债", "可转债"],
-                    "cross_border": ["纳斯达克", "标普", "恒生", "日经", "德国", "法国", "港股"]
-                }
-                
-                keywords = category_keywords.get(category, [])
-                if keywords:
-                    mask = df['名称'].apply(lambda x: any(kw in str(x) for kw in keywords))
-                    df = df[mask]
+            df, category_masks = get_cached_etf_derived('etf_category_masks', _build_category_masks)
+            
+            bit = CATEGORY_BITS.get(category)
+            if bit is not None:
+                df = df[(category_masks & bit) != 0]
             
             if df.empty:
                 return f"未找到{category}类别的ETF"
             
-            output = f"=== {category.upper()} ETF列表 (共{len(df)}只) ===\n\n"
+            parts = [f"=== {category.upper()} ETF列表 (共{len(df)}只) ===\n\n"]
             
             # 按涨跌幅排序，显示前20只
             df_sorted = df.sort_values('涨跌幅', ascending=False)
             
-            for _, row in df_sorted.head(20).iterrows():
-                output += f"{row['名称']}({row['代码']}): {row.get('最新价', 'N/A')} ({row.get('涨跌幅', 'N/A')}%)\n"
+            for name, code, price, change in zip(*_columns(df_sorted.head(20), '名称', '代码', '最新价', '涨跌幅')):
+                parts.append(f"{name}({code}): {price} ({change}%)\n")
             
             if len(df) > 20:
-                output += f"\n... 共{len(df)}只，仅显示涨幅前20只\n"
+                parts.append(f"\n... 共{len(df)}只，仅显示涨幅前20只\n")
             
-            return output
+            return ''.join(parts)
             
         except Exception as e:
             return f"获取ETF列表失败: {str(e)}"
@@ -697,50 +972,47 @@ def register_tools(mcp):
             if len(code_list) > 5:
                 return "最多支持比较5只ETF"
             
-            etf_df = get_cached_etf_spot()
+            parts = ["=== ETF对比分析 ===\n\n"]
+            parts.append(f"{'名称':<20} {'代码':<10} {'最新价':<10} {'涨跌幅':<10} {'换手率':<10}\n")
+            parts.append(DASH60 + "\n")
+            
+            rows = [get_cached_etf_row(code) for code in code_list]
             
-            output = "=== ETF对比分析 ===\n\n"
-            output += f"{'名称':<20} {'代码':<10} {'最新价':<10} {'涨跌幅':<10} {'换手率':<10}\n"
-            output += "-" * 60 + "\n"
+            # 各ETF的历史数据相互独立，提交到共用线程池并发抓取，结果保持输入顺序
+            found = [code for code, r in zip(code_list, rows) if r is not None]
+            futures = [_IO_EXECUTOR.submit(_fetch_hist_quietly, code, 250) for code in found]
+            hist_by_code = {code: future.result() for code, future in zip(found, futures)}
             
             comparison_data = []
             
-            for code in code_list:
-                row = etf_df[etf_df['代码'] == code]
-                if not row.empty:
-                    r = row.iloc[0]
+            for code, r in zip(code_list, rows):
+                if r is not None:
                     name = r['名称'][:10]
-                    output += f"{name:<20} {code:<10} {r.get('最新价', 'N/A'):<10} {r.get('涨跌幅', 'N/A')}%{'':<5} {r.get('换手率', 'N/A')}%\n"
+                    parts.append(f"{name:<20} {code:<10} {r.get('最新价', 'N/A'):<10} {r.get('涨跌幅', 'N/A')}%{'':<5} {r.get('换手率', 'N/A')}%\n")
                     
-                    # 获取历史数据计算更多指标
-                    try:
-                        hist_df = get_etf_hist_data(code, days=250)
-                        if len(hist_df) > 0:
-                            latest = hist_df['close'].iloc[-1]
-                            
-                            week_ret = round((latest - hist_df['close'].iloc[-5]) / hist_df['close'].iloc[-5] * 100, 2) if len(hist_df) >= 5 else None
-                            month_ret = round((latest - hist_df['close'].iloc[-22]) / hist_df['close'].iloc[-22] * 100, 2) if len(hist_df) >= 22 else None
-                            
-                            comparison_data.append({
-                                'name': r['名称'],
-                                'code': code,
-                                'week_return': week_ret,
-                                'month_return': month_ret
-                            })
-                    except:
-                        pass
+                    # 历史数据获取失败或无数据时不参与收益对比
+                    hist_df = hist_by_code[code]
+                    if hist_df is not None and len(hist_df) > 0:
+                        returns = _returns_dict(hist_df['close'].to_numpy())
+                        
+                        comparison_data.append({
+                            'name': r['名称'],
+                            'code': code,
+                            'week_return': returns.get('近一周'),
+                            'month_return': returns.get('近一月')
+                        })
                 else:
-                    output += f"{'未找到':<20} {code:<10}\n"
+                    parts.append(f"{'未找到':<20} {code:<10}\n")
             
             if comparison_data:
-                output += "\n【历史收益对比】\n"
-                output += f"{'名称':<15} {'周收益':<10} {'月收益':<10}\n"
-                output += "-" * 35 + "\n"
+                parts.append("\n【历史收益对比】\n")
+                parts.append(f"{'名称':<15} {'周收益':<10} {'月收益':<10}\n")
+                parts.append(DASH35 + "\n")
                 for d in comparison_data:
                     name = d['name'][:8]
-                    output += f"{name:<15} {d['week_return']}%{'':<5} {d['month_return']}%\n"
+                    parts.append(f"{name:<15} {d['week_return']}%{'':<5} {d['month_return']}%\n")
             
-            return output
+            return ''.join(parts)
             
         except Exception as e:
             return f"ETF对比失败: {str(e)}"
@@ -754,53 +1026,75 @@ def register_tools(mcp):
             市场整体概览报告
         """
         try:
-            output = f"{'='*50}\n"
-            output += f"  市场概览 - {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
-            output += f"{'='*50}\n\n"
+            parts = [SEP50 + "\n"]
+            parts.append(f"  市场概览 - {datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
+            parts.append(SEP50 + "\n\n")
             
-            # 1. 主要指数
+            # 1. 主要指数（只对网络获取做异常保护，获取失败或数据异常时在本节给出提示）
+            index_error = None
             try:
                 index_df = get_cached_index_spot_sina()
-                important_codes = ['sh000001', 'sz399001', 'sz399006', 'sh000300']
-                
-                output += "【主要指数】\n"
-                for _, row in index_df.iterrows():
-                    if row.get('代码', '') in important_codes:
-                        output += f"  {row['名称']}: {row['最新价']} ({row.get('涨跌幅', 0)}%)\n"
-                output += "\n"
-            except:
-                pass
+            except Exception as e:
+                index_df = None
+                index_error = f"获取指数行情失败: {str(e)}"
+            
+            if index_df is not None and '代码' not in index_df.columns:
+                index_error = "指数行情数据缺少代码列，无法筛选主要指数"
             
-            # 2. 热门ETF
+            parts.append("【主要指数】\n")
+            if index_error is not None:
+                parts.append(f"  {index_error}\n")
+            else:
+                index_df = index_df[index_df['代码'].isin(MARKET_INDEX_CODES)]
+                if index_df.empty:
+                    parts.append("  未找到主要指数行情\n")
+                for name, price, change in zip(*_columns(index_df, '名称', '最新价', '涨跌幅', default=0)):
+                    parts.append(f"  {name}: {price} ({change}%)\n")
+            parts.append("\n")
+            
+            # 2. 热门ETF / 3. 涨跌幅榜：共用同一份行情快照，获取失败或缺少所需列时给出提示
+            etf_error = None
             try:
                 etf_df = get_cached_etf_spot()
-                etf_sorted = etf_df.sort_values('成交额', ascending=False)
-                
-                output += "【成交额前10 ETF】\n"
-                for _, row in etf_sorted.head(10).iterrows():
-                    output += f"  {row['名称']}: {row.get('最新价', 'N/A')} ({row.get('涨跌幅', 'N/A')}%)\n"
-                output += "\n"
-            except:
-                pass
+            except Exception as e:
+                etf_df = None
+                etf_error = f"获取ETF行情失败: {str(e)}"
             
-            # 3. 涨幅榜
-            try:
-                etf_up = etf_df.sort_values('涨跌幅', ascending=False)
-                output += "【涨幅前5 ETF】\n"
-                for _, row in etf_up.head(5).iterrows():
-                    output += f"  {row['名称']}: +{row.get('涨跌幅', 'N/A')}%\n"
-                output += "\n"
+            if etf_df is not None:
+                missing = [col for col in ('名称', '成交额', '涨跌幅') if col not in etf_df.columns]
+                if missing:
+                    etf_error = f"ETF行情数据缺少列: {'、'.join(missing)}"
+            
+            if etf_error is not None:
+                parts.append("【热门ETF】\n")
+                parts.append(f"  {etf_error}\n\n")
+            else:
+                # 非数值（如停牌的"-"）按NaN处理，排在末尾
+                amounts = pd.to_numeric(etf_df['成交额'], errors='coerce').to_numpy(dtype=float)
+                changes = pd.to_numeric(etf_df['涨跌幅'], errors='coerce').to_numpy(dtype=float)
+                
+                # 只需首尾少数几只，按位置选出后取行，不对整表排序
+                parts.append("【成交额前10 ETF】\n")
+                top_amount = etf_df.iloc[_top_n_positions(amounts, 10, largest=True)]
+                for name, price, change in zip(*_columns(top_amount, '名称', '最新价', '涨跌幅')):
+                    parts.append(f"  {name}: {price} ({change}%)\n")
+                parts.append("\n")
+                
+                # 3. 涨幅榜
+                parts.append("【涨幅前5 ETF】\n")
+                gainers = etf_df.iloc[_top_n_positions(changes, 5, largest=True)]
+                for name, change in zip(*_columns(gainers, '名称', '涨跌幅')):
+                    parts.append(f"  {name}: +{change}%\n")
+                parts.append("\n")
                 
                 # 跌幅榜
-                etf_down = etf_df.sort_values('涨跌幅', ascending=True)
-                output += "【跌幅前5 ETF】\n"
-                for _, row in etf_down.head(5).iterrows():
-                    output += f"  {row['名称']}: {row.get('涨跌幅', 'N/A')}%\n"
-                output += "\n"
-            except:
-                pass
+                parts.append("【跌幅前5 ETF】\n")
+                losers = etf_df.iloc[_top_n_positions(changes, 5, largest=False)]
+                for name, change in zip(*_columns(losers, '名称', '涨跌幅')):
+                    parts.append(f"  {name}: {change}%\n")
+                parts.append("\n")
             
-            return output
+            return ''.join(parts)
             
         except Exception as e:
             return f"获取市场概览失败: {str(e)}"
@@ -810,6 +1104,8 @@ def register_tools(mcp):
         """
         获取ETF涨跌幅排行榜
         
+        当日排行覆盖全部ETF；近一周、近一月排行需逐只获取历史数据，从成交额前200只ETF中选出。
+        
         Args:
             period: 排行周期，"day"当日、"week"近一周、"month"近一月
             top_n: 显示前N只，默认10
@@ -822,69 +1118,59 @@ def register_tools(mcp):
             
             if period == "day":
                 # 当日涨跌幅
-                df_sorted_up = etf_df.sort_values('涨跌幅', ascending=False)
-                df_sorted_down = etf_df.sort_values('涨跌幅', ascending=True)
+                names = etf_df['名称'].to_numpy()
+                display = etf_df['涨跌幅'].to_numpy()
+                changes = display.astype(float)
                 period_name = "当日"
             else:
-                # 需要计算历史涨跌幅
-                results = []
+                # 需要计算历史涨跌幅：先按成交额选出候选ETF，再并发抓取候选的历史数据
+                offset = RANKING_OFFSETS.get(period)
+                amounts = pd.to_numeric(etf_df['成交额'], errors='coerce').to_numpy(dtype=float)
+                candidates = _top_n_positions(amounts, RANKING_CANDIDATES, largest=True) if offset else []
+                truncated = len(candidates) < len(etf_df)
+                codes = etf_df['代码'].to_numpy()[candidates]
+                all_names = etf_df['名称'].to_numpy()[candidates]
                 
-                for _, row in etf_df.iterrows():
-                    try:
-                        code = row['代码']
-                        hist_df = get_etf_hist_data(code, days=30)
-                        
-                        if len(hist_df) > 0:
-                            latest = hist_df['close'].iloc[-1]
-                            
-                            if period == "week" and len(hist_df) >= 5:
-                                base_price = hist_df['close'].iloc[-5]
-                                change = (latest - base_price) / base_price * 100
-                            elif period == "month" and len(hist_df) >= 22:
-                                base_price = hist_df['close'].iloc[-22]
-                                change = (latest - base_price) / base_price * 100
-                            else:
-                                continue
-                            
-                            results.append({
-                                'code': code,
-                                'name': row['名称'],
-                                'change': round(change, 2)
-                            })
-                    except:
+                with ThreadPoolExecutor(max_workers=RANKING_MAX_WORKERS) as executor:
+                    hist_list = list(executor.map(lambda c: _fetch_hist_quietly(c, 30), codes))
+                
+                kept_names, kept_closes = [], []
+                for name, hist_df in zip(all_names, hist_list):
+                    if hist_df is None or len(hist_df) < offset:
                         continue
-                    
-                    # 限制查询数量避免超时
-                    if len(results) >= 50:
-                        break
+                    kept_names.append(name)
+                    kept_closes.append(hist_df['close'].to_numpy()[-offset:])
                 
-                if not results:
+                if not kept_names:
                     return f"无法获取{period}周期的排行数据"
                 
-                results_df = pd.DataFrame(results)
-                df_sorted_up = results_df.sort_values('change', ascending=False)
-                df_sorted_down = results_df.sort_values('change', ascending=True)
+                # 每行为一只ETF最近offset个交易日的收盘价，一次性计算区间涨跌幅；
+                # 首尾收盘价缺失或基准价为0的行用掩码剔除，不逐行捕获异常
+                closes = np.vstack(kept_closes)
+                valid = np.isfinite(closes[:, -1]) & np.isfinite(closes[:, 0]) & (closes[:, 0] != 0)
+                if not valid.any():
+                    return f"无法获取{period}周期的排行数据"
+                
+                closes = closes[valid]
+                changes = np.round((closes[:, -1] - closes[:, 0]) / closes[:, 0] * 100, 2)
+                names = np.array(kept_names)[valid]
+                display = changes
                 period_name = "近一周" if period == "week" else "近一月"
             
-            output = f"=== ETF {period_name}涨跌幅排行 ===\n\n"
+            parts = [f"=== ETF {period_name}涨跌幅排行 ===\n\n"]
+            if period != "day" and truncated:
+                parts.append(f"（限于查询耗时，仅统计成交额前{RANKING_CANDIDATES}只ETF）\n\n")
             
-            output += f"【涨幅前{top_n}】\n"
-            if period == "day":
-                for i, (_, row) in enumerate(df_sorted_up.head(top_n).iterrows(), 1):
-                    output += f"  {i}. {row['名称']}: +{row.get('涨跌幅', 'N/A')}%\n"
-            else:
-                for i, (_, row) in enumerate(df_sorted_up.head(top_n).iterrows(), 1):
-                    output += f"  {i}. {row['name']}: +{row['change']}%\n"
+            # 按位置直接索引名称和涨跌幅数组，避免逐行构造Series
+            parts.append(f"【涨幅前{top_n}】\n")
+            for i, pos in enumerate(_top_n_positions(changes, top_n, largest=True), 1):
+                parts.append(f"  {i}. {names[pos]}: +{display[pos]}%\n")
             
-            output += f"\n【跌幅前{top_n}】\n"
-            if period == "day":
-                for i, (_, row) in enumerate(df_sorted_down.head(top_n).iterrows(), 1):
-                    output += f"  {i}. {row['名称']}: {row.get('涨跌幅', 'N/A')}%\n"
-            else:
-                for i, (_, row) in enumerate(df_sorted_down.head(top_n).iterrows(), 1):
-                    output += f"  {i}. {row['name']}: {row['change']}%\n"
+            parts.append(f"\n【跌幅前{top_n}】\n")
+            for i, pos in enumerate(_top_n_positions(changes, top_n, largest=False), 1):
+                parts.append(f"  {i}. {names[pos]}: {display[pos]}%\n")
             
-            return output
+            return ''.join(parts)
             
         except Exception as e:
             return f"获取排行榜失败: {str(e)}"
@@ -901,158 +1187,23 @@ def register_tools(mcp):
             趋势分析报告，包含多周期技术指标统计、趋势判断和综合评分
         """
         try:
-            # 获取历史数据（2年日线数据）
-            df = get_etf_hist_data(code, days=730)
+            # 报告主体在同一交易日内按日线数据的有效期缓存，仅报告头的分析时间实时生成
+            # 缓存key的日期与报告头的分析时间取自同一时刻
+            now = datetime.now()
+            cache_key = f"etf_trend_{code}_{now:%Y%m%d}"
+            cached = get_report_cache().get(cache_key, CACHE_TTL['etf_report'])
+            if cached is not None:
+                etf_name, body = cached
+                return _trend_report_header(etf_name, code, now) + body
             
-            if df.empty or len(df) < 60:
-                return f"数据量不足，无法分析趋势"
-            
-            # 转换为周线数据
-            weekly_df = resample_to_weekly(df)
-            
-            if len(weekly_df) < 30:
-                return f"周线数据量不足，无法分析趋势"
-            
-            # 获取ETF名称
             try:
-                etf_info = get_cached_etf_spot()
-                name_row = etf_info[etf_info['代码'] == code]
-                etf_name = name_row['名称'].values[0] if not name_row.empty else code
-            except:
-                etf_name = code
-            
-            # ========== 1. 当前技术指标 ==========
-            current_score_data = calculate_period_score(weekly_df)
-            if not current_score_data:
-                return "计算当前指标失败"
-            
-            latest_price = weekly_df['close'].iloc[-1]
-            
-            # ========== 2. 历史周期分析 ==========
-            # 近13周（约3个月/一季度）
-            stats_3m = analyze_historical_indicators(weekly_df, 13)
-            score_3m, judgments_3m = get_period_trend_judgment(stats_3m)
-            
-            # 近26周（约半年）
-            stats_6m = analyze_historical_indicators(weekly_df, 26)
-            score_6m, judgments_6m = get_period_trend_judgment(stats_6m)
-            
-            # 近52周（约一年）
-            stats_1y = analyze_historical_indicators(weekly_df, 52)
-            score_1y, judgments_1y = get_period_trend_judgment(stats_1y)
-            
-            # ========== 3. 综合评分 ==========
-            # 当前指标权重40%，近3月20%，近半年20%，近一年20%
-            current_score = current_score_data['score']
-            comprehensive_score = int(current_score * 0.4 + score_3m * 0.2 + score_6m * 0.2 + score_1y * 0.2)
-            
-            # 趋势判断
-            if comprehensive_score >= 40:
-                trend = "强势上涨趋势"
-                suggestion = "可考虑持有或逢低加仓"
-            elif comprehensive_score >= 15:
-                trend = "偏多震荡趋势"
-                suggestion = "可考虑轻仓参与，注意回调风险"
-            elif comprehensive_score >= -15:
-                trend = "横盘整理"
-                suggestion = "建议观望，等待方向明确"
-            elif comprehensive_score >= -40:
-                trend = "偏空震荡趋势"
-                suggestion = "建议减仓或观望，谨慎操作"
-            else:
-                trend = "弱势下跌趋势"
-                suggestion = "建议回避或空仓等待企稳"
-            
-            # ========== 生成报告 ==========
-            output = f"{'='*60}\n"
-            output += f"  {etf_name}({code}) 多周期技术指标分析报告\n"
-            output += f"  分析时间: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
-            output += f"{'='*60}\n\n"
-            
-            output += f"【当前价格】{latest_price:.4f}\n\n"
-            
-            # 当前指标
-            output += "=" * 40 + "\n"
-            output += "【当前周线技术指标】\n"
-            output += "=" * 40 + "\n"
-            output += f"  BOLL %B: {current_score_data['percent_b']:.1f}%\n"
-            output += f"  RSI(14): {current_score_data['rsi']:.1f}\n"
-            output += f"  MACD DIF: {current_score_data['dif']:.4f}, DEA: {current_score_data['dea']:.4f}\n"
-            output += f"  MA5周: {current_score_data['ma5']:.4f} {'↑' if latest_price > current_score_data['ma5'] else '↓'}\n"
-            output += f"  MA10周: {current_score_data['ma10']:.4f} {'↑' if latest_price > current_score_data['ma10'] else '↓'}\n"
-            output += f"  MA20周: {current_score_data['ma20']:.4f} {'↑' if latest_price > current_score_data['ma20'] else '↓'}\n"
-            output += f"  量比: {current_score_data['volume_ratio']:.2f}\n"
-            output += f"  当前评分: {current_score}分\n"
-            output += f"  信号: {', '.join(current_score_data['details'])}\n\n"
-            
-            # 近3个月统计
-            output += "=" * 40 + "\n"
-            output += f"【近3个月({stats_3m['weeks']}周)技术指标统计】\n"
-            output += "=" * 40 + "\n"
-            output += f"  区间涨跌幅: {stats_3m['total_change']}%\n"
-            output += f"  最大回撤: {stats_3m['max_drawdown']}%\n"
-            output += f"  最大涨幅: {stats_3m['max_rally']}%\n"
-            output += f"  上涨周数/下跌周数: {stats_3m['up_weeks']}/{stats_3m['down_weeks']}\n"
-            output += f"  RSI范围: {stats_3m['rsi_min']} ~ {stats_3m['rsi_max']} (均值{stats_3m['rsi_avg']})\n"
-            output += f"  RSI超卖/超买次数: {stats_3m['rsi_oversold_count']}/{stats_3m['rsi_overbought_count']}\n"
-            output += f"  BOLL%B范围: {stats_3m['pb_min']}% ~ {stats_3m['pb_max']}% (均值{stats_3m['pb_avg']}%)\n"
-            output += f"  BOLL触下轨/上轨次数: {stats_3m['pb_near_lower']}/{stats_3m['pb_near_upper']}\n"
-            output += f"  MACD金叉/死叉次数: {stats_3m['macd_cross_up']}/{stats_3m['macd_cross_down']}\n"
-            output += f"  周期评分: {score_3m}分\n"
-            output += f"  特征: {', '.join(judgments_3m)}\n\n"
-            
-            # 近半年统计
-            output += "=" * 40 + "\n"
-            output += f"【近半年({stats_6m['weeks']}周)技术指标统计】\n"
-            output += "=" * 40 + "\n"
-            output += f"  区间涨跌幅: {stats_6m['total_change']}%\n"
-            output += f"  最大回撤: {stats_6m['max_drawdown']}%\n"
-            output += f"  最大涨幅: {stats_6m['max_rally']}%\n"
-            output += f"  上涨周数/下跌周数: {stats_6m['up_weeks']}/{stats_6m['down_weeks']}\n"
-            output += f"  RSI范围: {stats_6m['rsi_min']} ~ {stats_6m['rsi_max']} (均值{stats_6m['rsi_avg']})\n"
-            output += f"  RSI超卖/超买次数: {stats_6m['rsi_oversold_count']}/{stats_6m['rsi_overbought_count']}\n"
-            output += f"  BOLL%B范围: {stats_6m['pb_min']}% ~ {stats_6m['pb_max']}% (均值{stats_6m['pb_avg']}%)\n"
-            output += f"  BOLL触下轨/上轨次数: {stats_6m['pb_near_lower']}/{stats_6m['pb_near_upper']}\n"
-            output += f"  MACD金叉/死叉次数: {stats_6m['macd_cross_up']}/{stats_6m['macd_cross_down']}\n"
-            output += f"  周期评分: {score_6m}分\n"
-            output += f"  特征: {', '.join(judgments_6m)}\n\n"
-            
-            # 近一年统计
-            output += "=" * 40 + "\n"
-            output += f"【近一年({stats_1y['weeks']}周)技术指标统计】\n"
-            output += "=" * 40 + "\n"
-            output += f"  区间涨跌幅: {stats_1y['total_change']}%\n"
-            output += f"  最大回撤: {stats_1y['max_drawdown']}%\n"
-            output += f"  最大涨幅: {stats_1y['max_rally']}%\n"
-            output += f"  上涨周数/下跌周数: {stats_1y['up_weeks']}/{stats_1y['down_weeks']}\n"
-            output += f"  RSI范围: {stats_1y['rsi_min']} ~ {stats_1y['rsi_max']} (均值{stats_1y['rsi_avg']})\n"
-            output += f"  RSI超卖/超买次数: {stats_1y['rsi_oversold_count']}/{stats_1y['rsi_overbought_count']}\n"
-            output += f"  BOLL%B范围: {stats_1y['pb_min']}% ~ {stats_1y['pb_max']}% (均值{stats_1y['pb_avg']}%)\n"
-            output += f"  BOLL触下轨/上轨次数: {stats_1y['pb_near_lower']}/{stats_1y['pb_near_upper']}\n"
-            output += f"  MACD金叉/死叉次数: {stats_1y['macd_cross_up']}/{stats_1y['macd_cross_down']}\n"
-            output += f"  周期评分: {score_1y}分\n"
-            output += f"  特征: {', '.join(judgments_1y)}\n\n"
-            
-            # 综合评分
-            output += "=" * 60 + "\n"
-            output += "【综合评分与趋势判断】\n"
-            output += "=" * 60 + "\n"
-            output += f"  当前指标评分(权重40%): {current_score}分\n"
-            output += f"  近3个月评分(权重20%): {score_3m}分\n"
-            output += f"  近半年评分(权重20%): {score_6m}分\n"
-            output += f"  近一年评分(权重20%): {score_1y}分\n"
-            output += f"  ─────────────────────\n"
-            output += f"  【综合评分】{comprehensive_score}分\n"
-            output += f"  【趋势判断】{trend}\n"
-            output += f"  【操作建议】{suggestion}\n\n"
-            
-            # 风险提示
-            output += "【风险提示】\n"
-            output += "  • 以上分析基于周线数据，适合中长期投资参考\n"
-            output += "  • 历史表现不代表未来收益，投资有风险\n"
-            output += "  • 建议结合基本面和宏观环境综合判断\n"
+                data = _analyze_trend_core(code)
+            except ValueError as e:
+                return str(e)
             
-            return output
+            body = _format_trend_body(data)
+            get_report_cache().set(cache_key, (data['name'], body))
+            return _trend_report_header(data['name'], code, now) + body
             
         except Exception as e:
             return f"趋势分析失败: {str(e)}"
@@ -1074,65 +1225,47 @@ def register_tools(mcp):
             if len(name_list) > 10:
                 return "最多支持同时查询10只ETF"
             
-            results = []
+            # 行情表和名称索引在并发前取一次，避免冷缓存时各线程同时下载行情、重复建索引；
+            # 获取失败时由各名称的搜索分别返回错误
+            try:
+                get_cached_etf_name_index()
+            except Exception:
+                pass
             
-            for name in name_list:
-                etf_list = search_etf_by_name(name)
-                if not etf_list or 'error' in etf_list[0]:
-                    continue
-                
-                etf = etf_list[0]
-                code = etf['code']
-                
-                try:
-                    df = get_etf_hist_data(code, days=120)
-                    if len(df) < 30:
-                        continue
-                    
-                    weekly_df = resample_to_weekly(df)
-                    
-                    # 计算指标
-                    rsi_14 = calculate_rsi(weekly_df['close'], 14).iloc[-1]
-                    macd = calculate_macd(weekly_df['close'])
-                    boll = calculate_boll(weekly_df)
-                    
-                    # 近期涨跌幅
-                    latest = df['close'].iloc[-1]
-                    week_change = round((latest - df['close'].iloc[-5]) / df['close'].iloc[-5] * 100, 2) if len(df) >= 5 else None
-                    month_change = round((latest - df['close'].iloc[-22]) / df['close'].iloc[-22] * 100, 2) if len(df) >= 22 else None
-                    
-                    results.append({
-                        'name': etf['name'][:12],
-                        'code': code,
-                        'price': latest,
-                        'week_change': week_change,
-                        'month_change': month_change,
-                        'rsi': round(rsi_14, 1),
-                        'macd_signal': '多' if macd['dif'].iloc[-1] > macd['dea'].iloc[-1] else '空',
-                        'boll_pb': round(boll['percent_b'].iloc[-1], 1)
-                    })
-                except:
-                    continue
+            # 各ETF相互独立，并发抓取，结果保持输入顺序
+            with ThreadPoolExecutor(max_workers=len(name_list)) as executor:
+                results = [r for r in executor.map(_multi_etf_fetch, name_list) if r is not None]
             
             if not results:
                 return "未能获取任何ETF数据"
             
-            output = "=== 多ETF技术指标对比 ===\n\n"
-            output += f"{'名称':<14} {'代码':<8} {'价格':<8} {'周涨跌':<8} {'月涨跌':<8} {'RSI':<6} {'MACD':<6} {'BOLL%B':<8}\n"
-            output += "-" * 80 + "\n"
+            # 周线收盘价按末端对齐拼成一张表（每列一只ETF），一次性计算全部指标
+            closes = pd.concat({
+                i: pd.Series(r['weekly_close'], index=np.arange(-len(r['weekly_close']), 0))
+                for i, r in enumerate(results)
+            }, axis=1)
+            latest = calculate_latest_indicators(closes)
+            for i, r in enumerate(results):
+                r['rsi'] = round(latest.at[i, 'rsi'], 1)
+                r['macd_signal'] = '多' if latest.at[i, 'dif'] > latest.at[i, 'dea'] else '空'
+                r['boll_pb'] = round(latest.at[i, 'percent_b'], 1)
+            
+            parts = ["=== 多ETF技术指标对比 ===\n\n"]
+            parts.append(f"{'名称':<14} {'代码':<8} {'价格':<8} {'周涨跌':<8} {'月涨跌':<8} {'RSI':<6} {'MACD':<6} {'BOLL%B':<8}\n")
+            parts.append(DASH80 + "\n")
             
             for r in results:
-                output += f"{r['name']:<14} {r['code']:<8} {r['price']:<8.3f} "
-                output += f"{r['week_change']}%{'':<3} " if r['week_change'] else "N/A      "
-                output += f"{r['month_change']}%{'':<3} " if r['month_change'] else "N/A      "
-                output += f"{r['rsi']:<6} {r['macd_signal']:<6} {r['boll_pb']}%\n"
+                parts.append(f"{r['name']:<14} {r['code']:<8} {r['price']:<8.3f} ")
+                parts.append(f"{r['week_change']}%{'':<3} " if r['week_change'] else "N/A      ")
+                parts.append(f"{r['month_change']}%{'':<3} " if r['month_change'] else "N/A      ")
+                parts.append(f"{r['rsi']:<6} {r['macd_signal']:<6} {r['boll_pb']}%\n")
             
-            output += "\n【指标说明】\n"
-            output += "  RSI: <30超卖, >70超买\n"
-            output += "  MACD: 多=金叉, 空=死叉\n"
-            output += "  BOLL%B: <20接近下轨, >80接近上轨\n"
+            parts.append("\n【指标说明】\n")
+            parts.append("  RSI: <30超卖, >70超买\n")
+            parts.append("  MACD: 多=金叉, 空=死叉\n")
+            parts.append("  BOLL%B: <20接近下轨, >80接近上轨\n")
             
-            return output
+            return ''.join(parts)
             
         except Exception as e:
             return f"批量查询失败: {str(e)}"
@@ -1157,12 +1290,12 @@ def register_tools(mcp):
             缓存统计信息
         """
         stats = cache_stats()
-        output = "=== 缓存状态 ===\n\n"
-        output += f"缓存项数: {stats['cache_size']}\n"
-        output += f"缓存键列表:\n"
+        parts = ["=== 缓存状态 ===\n\n"]
+        parts.append(f"缓存项数: {stats['cache_size']}\n")
+        parts.append(f"缓存键列表:\n")
         for key in stats['keys']:
-            output += f"  - {key}\n"
-        output += f"\n缓存过期时间配置:\n"
+            parts.append(f"  - {key}\n")
+        parts.append(f"\n缓存过期时间配置:\n")
         for k, v in CACHE_TTL.items():
-            output += f"  {k}: {v}秒\n"
-        return output
+            parts.append(f"  {k}: {v}秒\n")
+        return ''.join(parts)